@@ -0,0 +1,135 @@
+import asyncio
+import concurrent.futures
+import logging
+import time
+from typing import Dict, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+
+class AdmissionSlot:
+    """One admitted unit of inference work, released exactly once.
+
+    Releasing is synchronous, so it cannot be lost to a cancellation that
+    lands in a ``finally`` block. If the work was handed to a thread with
+    ``hold_until``, the slot stays taken until that thread finishes, even
+    when the task awaiting it is cancelled first.
+    """
+
+    def __init__(self, controller: "AdmissionController", session_id: str):
+        self.controller = controller
+        self.session_id = session_id
+        self.started_at = time.monotonic()
+        self.released = False
+        self._pending: Optional[concurrent.futures.Future] = None
+
+    def hold_until(self, future: concurrent.futures.Future):
+        """Keep the slot until an executor future completes"""
+        self._pending = future
+        loop = asyncio.get_running_loop()
+        future.add_done_callback(lambda f: loop.call_soon_threadsafe(self._finish))
+
+    def release(self):
+        """Give the slot back now, or once the held executor work finishes"""
+        if self._pending is None:
+            self._finish()
+
+    def _finish(self):
+        if not self.released:
+            self.released = True
+            self.controller._release(self.session_id, self.started_at)
+
+
+class AdmissionController:
+    """Global and per-session limits on in-flight frame inference.
+
+    Playhead requests may use the full global limit, while background sweeps
+    are capped at ``background_limit`` so live playheads always have
+    headroom. ``pressure()`` combines running and waiting work and drives how
+    far the background sampling interval is widened.
+    """
+
+    def __init__(self, global_limit: int = 4, session_limit: int = 2,
+                 background_limit: int = 2, max_interval_factor: float = 8.0):
+        self.global_limit = max(1, global_limit)
+        self.session_limit = max(1, session_limit)
+        self.background_limit = max(1, min(background_limit, self.global_limit))
+        self.max_interval_factor = max(1.0, max_interval_factor)
+        self.inflight = 0
+        self.waiting = 0
+        self.session_inflight: Dict[str, int] = {}
+        self.admitted = 0
+        self.rejected = 0
+        self.latency_ewma = 0.0
+        self._cond = asyncio.Condition()
+        self._wakeups: Set[asyncio.Task] = set()
+
+    def _can_admit(self, session_id: str, background: bool) -> bool:
+        if self.session_inflight.get(session_id, 0) >= self.session_limit:
+            return False
+        limit = self.background_limit if background else self.global_limit
+        return self.inflight < limit
+
+    async def acquire(self, session_id: str, timeout: float = None, background: bool = False) -> Optional[AdmissionSlot]:
+        """Wait for an inference slot; returns None if ``timeout`` expires first"""
+        async with self._cond:
+            self.waiting += 1
+            try:
+                await asyncio.wait_for(
+                    self._cond.wait_for(lambda: self._can_admit(session_id, background)),
+                    timeout
+                )
+            except asyncio.TimeoutError:
+                self.rejected += 1
+                return None
+            finally:
+                self.waiting -= 1
+            self.inflight += 1
+            self.session_inflight[session_id] = self.session_inflight.get(session_id, 0) + 1
+            self.admitted += 1
+            return AdmissionSlot(self, session_id)
+
+    def _release(self, session_id: str, started_at: float):
+        # Counters change synchronously; only waking waiters needs the lock,
+        # and that happens in a task of its own that callers cannot cancel
+        self.inflight -= 1
+        remaining = self.session_inflight.get(session_id, 1) - 1
+        if remaining > 0:
+            self.session_inflight[session_id] = remaining
+        else:
+            self.session_inflight.pop(session_id, None)
+        elapsed = time.monotonic() - started_at
+        self.latency_ewma = 0.8 * self.latency_ewma + 0.2 * elapsed
+        task = asyncio.get_running_loop().create_task(self._wake_waiters())
+        self._wakeups.add(task)
+        task.add_done_callback(self._wakeups.discard)
+
+    async def _wake_waiters(self):
+        async with self._cond:
+            self._cond.notify_all()
+
+    def pressure(self) -> float:
+        """Running plus queued work relative to the global limit"""
+        return (self.inflight + self.waiting) / self.global_limit
+
+    def sampling_interval(self, base_interval: float) -> float:
+        """Background sweep interval, widened as the server saturates.
+
+        Below half load the base interval is used; beyond that it grows
+        linearly with pressure up to ``max_interval_factor`` times the base.
+        """
+        factor = min(self.max_interval_factor, max(1.0, 2.0 * self.pressure()))
+        return base_interval * factor
+
+    def stats(self) -> dict:
+        return {
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "global_limit": self.global_limit,
+            "session_limit": self.session_limit,
+            "background_limit": self.background_limit,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "pressure": round(self.pressure(), 3),
+            "inference_latency_ms": round(self.latency_ewma * 1000, 1),
+        }
@@ -0,0 +1,243 @@
+import cv2
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from tracing import NULL_SPAN
+
+logger = logging.getLogger(__name__)
+
+
+def _no_span(name: str):
+    return NULL_SPAN
+
+
+def file_content_hash(path: str, block_size: int = 1024 * 1024) -> str:
+    """Return the SHA-256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class _PooledCapture:
+    """One decoder for one piece of content, possibly shared by several sessions"""
+
+    def __init__(self, content_hash: str, video_path: str):
+        self.content_hash = content_hash
+        self.video_path = video_path
+        self.cap: Optional[cv2.VideoCapture] = None
+        # Frame index the decoder will return on the next read(); kept across
+        # evictions so a reopened capture can seek straight back to it
+        self.position = 0
+        self.sessions = set()
+        # Guards the capture itself; held by whichever thread is decoding
+        self.lock = threading.Lock()
+        # Set under the pool lock when the capture must not be read again
+        # (evicted, re-pointed or unused); whoever next holds ``lock`` closes it
+        self.close_pending = False
+
+    @property
+    def is_open(self) -> bool:
+        return self.cap is not None
+
+    def open(self) -> bool:
+        cap = cv2.VideoCapture(self.video_path)
+        if not cap.isOpened():
+            logger.error(f"Capture pool could not open {self.video_path}")
+            cap.release()
+            return False
+        if self.position > 0:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, self.position)
+        self.cap = cap
+        return True
+
+    def close(self):
+        if self.cap is not None:
+            try:
+                self.cap.release()
+            except Exception as e:
+                logger.error(f"Error releasing capture for {self.content_hash[:12]}: {e}")
+            self.cap = None
+
+
+class CapturePool:
+    """Bounded pool of cv2.VideoCapture objects shared across sessions.
+
+    Captures are keyed by content hash, so sessions watching the same video
+    share one decoder. At most ``max_open`` captures are held open; when the
+    limit is reached the least recently used idle capture is released and
+    reopened (seeking back to its last position) the next time it is needed.
+
+    Only decoding threads ever wait on a capture's own lock. Detaching,
+    re-pointing or evicting one just marks it under the pool lock and closes
+    it if nobody is reading; otherwise the reader closes it after its read.
+    These calls are therefore safe on the event loop.
+    """
+
+    def __init__(self, max_open: int = 32):
+        self.max_open = max(1, max_open)
+        self._entries: Dict[str, _PooledCapture] = {}
+        self._session_hashes: Dict[str, str] = {}
+        self._session_paths: Dict[str, str] = {}
+        # Open entries only, least recently used first; an entry joins once
+        # its capture is actually open
+        self._lru: "OrderedDict[str, _PooledCapture]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.opens = 0
+        self.evictions = 0
+
+    def register(self, session_id: str, video_path: str, content_hash: str):
+        """Attach a session to the decoder for its content"""
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is None:
+                entry = _PooledCapture(content_hash, video_path)
+                self._entries[content_hash] = entry
+                logger.info(f"Capture pool: new entry {content_hash[:12]} for session {session_id}")
+            else:
+                logger.info(f"Capture pool: session {session_id} sharing decoder {content_hash[:12]}")
+            entry.sessions.add(session_id)
+            self._session_hashes[session_id] = content_hash
+            self._session_paths[session_id] = video_path
+
+    def unregister(self, session_id: str):
+        """Detach a session, releasing its decoder once no session uses it.
+
+        If other sessions still share the decoder but it is reading from this
+        session's file, it is moved onto a surviving session's copy so the
+        caller may delete its own file afterwards.
+        """
+        with self._lock:
+            content_hash = self._session_hashes.pop(session_id, None)
+            video_path = self._session_paths.pop(session_id, None)
+            if content_hash is None:
+                return
+            entry = self._entries[content_hash]
+            entry.sessions.discard(session_id)
+            replacement = None
+            if not entry.sessions:
+                del self._entries[content_hash]
+                self._lru.pop(content_hash, None)
+                entry.close_pending = True
+            elif entry.video_path == video_path:
+                replacement = self._session_paths[next(iter(entry.sessions))]
+        if replacement is not None:
+            self.set_source(content_hash, replacement)
+            return
+        self._close_when_idle(entry)
+        logger.info(f"Capture pool: released decoder {content_hash[:12]}")
+
+    def rekey(self, session_id: str, content_hash: str):
+        """Move a session onto the decoder for ``content_hash``, e.g. once it is verified"""
+        with self._lock:
+            video_path = self._session_paths.get(session_id)
+            if video_path is None or self._session_hashes[session_id] == content_hash:
+                return
+        self.unregister(session_id)
+        self.register(session_id, video_path, content_hash)
+
+    def set_source(self, content_hash: str, video_path: str):
+        """Point an entry at a different file (same frame numbering), reopening lazily"""
+        with self._lock:
+            entry = self._entries.get(content_hash)
+            if entry is None:
+                return
+            entry.video_path = video_path
+            self._lru.pop(content_hash, None)
+            entry.close_pending = True
+        self._close_when_idle(entry)
+        logger.info(f"Capture pool: {content_hash[:12]} now reading from {video_path}")
+
+    @staticmethod
+    def _close_when_idle(entry: _PooledCapture):
+        """Close a capture marked ``close_pending`` now, unless a reader holds it.
+
+        A reader closes it itself after its read; at the latest the next
+        reader of the entry does, before reading.
+        """
+        if entry.lock.acquire(blocking=False):
+            try:
+                if entry.close_pending:
+                    entry.close()
+                    entry.close_pending = False
+            finally:
+                entry.lock.release()
+
+    def _checkout(self, session_id: str) -> Optional[_PooledCapture]:
+        """A session's entry, marked most recently used if it is open"""
+        with self._lock:
+            content_hash = self._session_hashes.get(session_id)
+            if content_hash is None:
+                return None
+            if content_hash in self._lru:
+                self._lru.move_to_end(content_hash)
+            return self._entries[content_hash]
+
+    def _track_open(self, entry: _PooledCapture):
+        """Count a freshly opened capture against the limit, evicting idle ones past it"""
+        victims = []
+        with self._lock:
+            if self._entries.get(entry.content_hash) is not entry or entry.close_pending:
+                # Released or re-pointed while it was being opened; the
+                # reader closes it again after this read
+                entry.close_pending = True
+                return
+            self._lru[entry.content_hash] = entry
+            while len(self._lru) > self.max_open:
+                victim_hash, victim = next(iter(self._lru.items()))
+                del self._lru[victim_hash]
+                victim.close_pending = True
+                victims.append(victim)
+                self.evictions += 1
+        for victim in victims:
+            self._close_when_idle(victim)
+            logger.debug(f"Capture pool: evicted idle decoder {victim.content_hash[:12]} at frame {victim.position}")
+
+    def read_frame(self, session_id: str, frame_number: int, span=_no_span) -> Tuple[bool, Optional[np.ndarray]]:
+        """Decode ``frame_number`` for a session, reopening its capture if evicted.
+
+        ``span(name)`` returns a context manager timing each stage (tracing).
+        """
+        entry = self._checkout(session_id)
+        if entry is None:
+            return False, None
+        with entry.lock:
+            if entry.close_pending:
+                entry.close()
+                entry.close_pending = False
+            if not entry.is_open:
+                entry.position = frame_number
+                with span("capture_reopen"):
+                    if not entry.open():
+                        return False, None
+                self.opens += 1
+                self._track_open(entry)
+            elif entry.position != frame_number:
+                # Sequential reads skip the (expensive) seek entirely
+                with span("cap.set"):
+                    entry.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
+            with span("cap.read"):
+                ret, frame = entry.cap.read()
+            entry.position = frame_number + 1 if ret else frame_number
+            # Evicted, re-pointed or released while this read was running
+            if entry.close_pending:
+                entry.close()
+                entry.close_pending = False
+            return ret, frame
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_open": self.max_open,
+                "open": len(self._lru),
+                "entries": len(self._entries),
+                "sessions": len(self._session_hashes),
+                "opens": self.opens,
+                "evictions": self.evictions,
+            }
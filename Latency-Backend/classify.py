@@ -5,6 +5,11 @@ import numpy as np
 import logging
 import subprocess
 import os
+import json
+import triage
+from timeline import merge_intervals, to_webvtt
+from capture_pool import file_content_hash
+from frame_store import FRAME_STORE_DIR, FrameStore
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -18,6 +23,20 @@ except Exception as e:
     logger.error(f"Failed to load classifier: {e}")
     raise
 
+def _frame_store_for(input_path):
+    """Return (store, content_hash) when FRAME_STORE_DIR is set, else (None, None)"""
+    if not FRAME_STORE_DIR:
+        return None, None
+    return FrameStore(FRAME_STORE_DIR), file_content_hash(input_path)
+
+def _store_frame(store, content_hash, timestamp, rgb_frame):
+    if store is None:
+        return
+    try:
+        store.add(content_hash, timestamp, rgb_frame)
+    except Exception as e:
+        logger.error(f"Error storing frame at {timestamp:.3f}s: {e}")
+
 def process_video(input_path, output_path, frame_skip=30):
     """Process video to detect NSFW content and overlay classification results"""
     logger.info(f"Starting video processing: {input_path}")
@@ -34,6 +53,9 @@ def process_video(input_path, output_path, frame_skip=30):
     
     logger.info(f"Video properties - FPS: {fps}, Size: {width}x{height}, Total frames: {total_frames}")
     
+    store, content_hash = _frame_store_for(input_path)
+    frame_rate = cap.get(cv2.CAP_PROP_FPS)
+    
     # Create temporary output path
     temp_output = output_path.replace('.mp4', '_temp.avi')
     
@@ -78,6 +100,7 @@ def process_video(input_path, output_path, frame_skip=30):
                 try:
                     # Convert BGR to RGB for PIL
                     rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                    _store_frame(store, content_hash, frame_count / frame_rate, rgb_frame)
                     pil_image = Image.fromarray(rgb_frame)
                     
                     # Get classification
@@ -113,6 +136,8 @@ def process_video(input_path, output_path, frame_skip=30):
         cap.release()
         out.release()
         cv2.destroyAllWindows()
+        if store is not None:
+            store.release(content_hash)
     
     # Convert to web-compatible MP4 using ffmpeg if available
     try:
@@ -129,6 +154,67 @@ def process_video(input_path, output_path, frame_skip=30):
     
     logger.info(f"Video processing completed: {output_path}")
 
+def export_timeline(input_path, output_prefix, frame_skip=30):
+    """Classify a video and write merged intervals as JSON and WebVTT, without re-encoding"""
+    logger.info(f"Starting timeline export: {input_path}")
+    
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {input_path}")
+    
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration = total_frames / fps if fps > 0 else 0
+    store, content_hash = _frame_store_for(input_path)
+    
+    entries = []
+    frame_count = 0
+    try:
+        while True:
+            # Frames in between are only grabbed, never converted or drawn on
+            if frame_count % frame_skip != 0:
+                if not cap.grab():
+                    break
+                frame_count += 1
+                continue
+            
+            ret, frame = cap.read()
+            if not ret:
+                break
+            
+            try:
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                timestamp = frame_count / fps
+                _store_frame(store, content_hash, timestamp, rgb_frame)
+                result = classifier(Image.fromarray(rgb_frame))[0]
+                entries.append({
+                    "start": timestamp,
+                    "end": timestamp,
+                    "source": "frame",
+                    "label": result["label"],
+                    "confidence": float(result["score"]),
+                    "is_nsfw": result["label"].lower() != "normal"
+                })
+                logger.info(f"Frame {frame_count}: {result['label']} ({result['score']:.2f})")
+            except Exception as e:
+                logger.error(f"Error processing frame {frame_count}: {e}")
+            
+            frame_count += 1
+    finally:
+        cap.release()
+        if store is not None:
+            store.release(content_hash)
+    
+    intervals = merge_intervals(entries, frame_skip / fps if fps > 0 else 0)
+    
+    with open(f"{output_prefix}.json", "w") as f:
+        json.dump({"duration": duration, "intervals": intervals}, f, indent=2)
+    with open(f"{output_prefix}.vtt", "w") as f:
+        f.write(to_webvtt(intervals))
+    
+    logger.info(f"Timeline export completed: {output_prefix}.json, {output_prefix}.vtt ({len(intervals)} intervals)")
+    return intervals
+
 def convert_to_web_mp4(input_path, output_path):
     """Convert video to web-compatible MP4 using ffmpeg"""
     try:
@@ -158,6 +244,13 @@ def convert_to_web_mp4(input_path, output_path):
         logger.warning("ffmpeg not found, skipping conversion")
         raise Exception("ffmpeg not available")
 
+def triage_video(input_path):
+    """Screen a video from its keyframes only, densifying around suspicious ones"""
+    return triage.triage_video(
+        input_path,
+        lambda rgb_frame: classifier(Image.fromarray(rgb_frame))[0]
+    )
+
 def test_classifier():
     """Test function to verify classifier is working"""
     try:
@@ -0,0 +1,171 @@
+import asyncio
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+# chunks.py lives at the repository root, next to the offline tooling
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from chunks import iter_video_chunks  # noqa: E402
+
+logger = logging.getLogger(__name__)
+
+# State dict for a torchvision r3d_18 fine-tuned on 112x112 clips. Clip
+# analysis is unavailable unless this is set.
+CLIP_MODEL_CHECKPOINT = os.environ.get("CLIP_MODEL_CHECKPOINT", "")
+# Output classes of the checkpoint, in order; anything but "normal" is NSFW
+CLIP_MODEL_LABELS = os.environ.get("CLIP_MODEL_LABELS", "normal,nsfw").split(",")
+CLIP_BATCH_SIZE = int(os.environ.get("CLIP_BATCH_SIZE", "4"))
+# Threads decoding clips across all sessions. Clip work runs on its own
+# pools so it never queues ahead of per-frame playhead inference.
+CLIP_DECODE_WORKERS = int(os.environ.get("CLIP_DECODE_WORKERS", "2"))
+# Clip geometry, matching chunks.get_video_chunks defaults
+CLIP_DURATION = 10
+CLIP_OVERLAP = 2
+CLIP_FPS = 10
+
+# Kinetics-400 normalization used by torchvision video models
+_MEAN = np.array([0.43216, 0.394666, 0.37645], dtype=np.float32)
+_STD = np.array([0.22803, 0.22145, 0.216989], dtype=np.float32)
+
+
+class TemporalClassifier:
+    """Batched video-level classifier over clips from chunks.iter_video_chunks"""
+
+    def __init__(self, checkpoint: str, labels: List[str], num_frames: int = 16):
+        import torch
+        from torchvision.models.video import r3d_18
+
+        self.torch = torch
+        self.labels = labels
+        self.num_frames = num_frames
+        self.model = r3d_18(num_classes=len(labels))
+        self.model.load_state_dict(torch.load(checkpoint, map_location="cpu"))
+        self.model.eval()
+
+    def _prepare(self, frames: List[np.ndarray]) -> np.ndarray:
+        """Uniformly subsample a clip to num_frames and normalize to (C, T, H, W)"""
+        idx = np.linspace(0, len(frames) - 1, self.num_frames).astype(int)
+        clip = np.stack([frames[i] for i in idx]).astype(np.float32) / 255.0
+        clip = (clip - _MEAN) / _STD
+        return clip.transpose(3, 0, 1, 2)
+
+    def classify(self, clips: List[List[np.ndarray]]) -> List[dict]:
+        batch = self.torch.from_numpy(np.stack([self._prepare(c) for c in clips]))
+        with self.torch.inference_mode():
+            probs = self.torch.softmax(self.model(batch), dim=1).numpy()
+        results = []
+        for row in probs:
+            best = int(row.argmax())
+            results.append({"label": self.labels[best], "score": float(row[best])})
+        return results
+
+
+def create_temporal_classifier():
+    """Build the clip model, or None if clip analysis is not configured"""
+    if not CLIP_MODEL_CHECKPOINT:
+        logger.info("CLIP_MODEL_CHECKPOINT not set, clip analysis disabled")
+        return None
+    try:
+        model = TemporalClassifier(CLIP_MODEL_CHECKPOINT, CLIP_MODEL_LABELS)
+        logger.info(f"Temporal clip classifier loaded from {CLIP_MODEL_CHECKPOINT}")
+        return model
+    except Exception as e:
+        logger.error(f"Failed to load temporal clip classifier: {e}")
+        return None
+
+
+class ClipBatcher:
+    """Collects clips from all sessions into batches for the temporal model.
+
+    Runs alongside the per-frame classifier: batches execute one at a time
+    on a dedicated thread, so neither frame inference nor the event loop
+    waits on the temporal model.
+    """
+
+    def __init__(self, model: TemporalClassifier, batch_size: int = CLIP_BATCH_SIZE, max_wait: float = 0.05):
+        self.model = model
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait
+        # Bounded so fast decoders wait for the model instead of piling up clips
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=self.batch_size * 4)
+        self.task = None
+        self.clips_processed = 0
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="clip-infer")
+
+    async def classify(self, frames: List[np.ndarray]) -> dict:
+        if self.task is None or self.task.done():
+            self.task = asyncio.create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((frames, future))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self.queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+
+            # Skip clips whose session went away while queued
+            batch = [(frames, future) for frames, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+            try:
+                results = await asyncio.get_running_loop().run_in_executor(
+                    self.executor, self.model.classify, [frames for frames, _ in batch]
+                )
+                for (_, future), result in zip(batch, results):
+                    if not future.done():
+                        future.set_result(result)
+            except Exception as e:
+                logger.error(f"Clip batch inference failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            self.clips_processed += len(batch)
+
+
+_decode_executor = ThreadPoolExecutor(max_workers=max(1, CLIP_DECODE_WORKERS), thread_name_prefix="clip-decode")
+
+
+class ClipStream:
+    """Clips of one video, decoded incrementally on the shared clip decode pool"""
+
+    def __init__(self, video_path: str):
+        self._clips = iter_video_chunks(
+            video_path,
+            chunk_duration=CLIP_DURATION,
+            overlap=CLIP_OVERLAP,
+            target_fps=CLIP_FPS
+        )
+        self._pending = None
+
+    async def next(self):
+        """Decode the next (start_time, frames) clip, or None at the end"""
+        self._pending = _decode_executor.submit(next, self._clips, None)
+        return await asyncio.wrap_future(self._pending)
+
+    def close(self):
+        # A decode step still running in the pool owns the generator, which
+        # cannot be closed until that step returns; close it from there
+        if self._pending is not None and not self._pending.done():
+            self._pending.add_done_callback(lambda f: self._clips.close())
+        else:
+            self._clips.close()
+
+
+def open_clip_stream(video_path: str) -> ClipStream:
+    """Incremental clip stream for a session's video"""
+    return ClipStream(video_path)
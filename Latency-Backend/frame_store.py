@@ -0,0 +1,172 @@
+import cv2
+import fcntl
+import json
+import logging
+import os
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Root of the persistent frame store; persistence is off when empty
+FRAME_STORE_DIR = os.environ.get("FRAME_STORE_DIR", "")
+# Frames are stored square at model resolution
+FRAME_STORE_SIZE = int(os.environ.get("FRAME_STORE_SIZE", "224"))
+
+_RECORDS_FILE = "frames.rec"
+_META_FILE = "meta.json"
+
+
+def record_dtype(size: int) -> np.dtype:
+    """One stored frame: its timestamp followed by size x size RGB pixels"""
+    return np.dtype([("timestamp", "<f8"), ("pixels", np.uint8, (size, size, 3))])
+
+
+class _HashWriter:
+    """Appends (timestamp, pixels) records for one content hash.
+
+    Every append happens under an exclusive ``flock`` on the record file,
+    so several worker processes (or classify.py next to the server) can
+    write the same hash without interleaving. Under that lock the writer
+    first drops a trailing partial record left by a crashed writer and
+    picks up timestamps other processes appended, so duplicates are
+    skipped across processes too.
+    """
+
+    def __init__(self, directory: str, size: int):
+        self.directory = directory
+        self.size = size
+        self.itemsize = record_dtype(size).itemsize
+        self.lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+        meta_path = os.path.join(directory, _META_FILE)
+        if os.path.exists(meta_path):
+            with open(meta_path) as f:
+                stored_size = json.load(f)["size"]
+            if stored_size != size:
+                raise ValueError(f"Frame store at {directory} uses size {stored_size}, not {size}")
+        else:
+            with open(meta_path + f".{os.getpid()}", "w") as f:
+                json.dump({"size": size, "dtype": "uint8", "channels": "RGB", "record": "timestamp<f8,pixels"}, f)
+            os.replace(meta_path + f".{os.getpid()}", meta_path)
+
+        self.fd = os.open(os.path.join(directory, _RECORDS_FILE), os.O_RDWR | os.O_CREAT | os.O_APPEND, 0o644)
+        self.seen = set()
+        # Bytes of the record file whose timestamps are already in ``seen``
+        self.scanned = 0
+        with self._file_lock():
+            self._catch_up()
+
+    @contextmanager
+    def _file_lock(self):
+        fcntl.flock(self.fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+
+    def _catch_up(self):
+        """With the file lock held: repair a torn tail and learn new timestamps"""
+        end = os.fstat(self.fd).st_size
+        whole = end - end % self.itemsize
+        if whole != end:
+            logger.warning(f"Dropping {end - whole} bytes of a partial record in {self.directory}")
+            os.ftruncate(self.fd, whole)
+        if whole < self.scanned:
+            # Truncated behind our back; rescan from the start
+            self.seen.clear()
+            self.scanned = 0
+        for offset in range(self.scanned, whole, self.itemsize):
+            timestamp = np.frombuffer(os.pread(self.fd, 8, offset), dtype="<f8")[0]
+            self.seen.add(round(float(timestamp), 3))
+        self.scanned = whole
+
+    def add(self, timestamp: float, rgb_frame: np.ndarray) -> bool:
+        key = round(timestamp, 3)
+        if key in self.seen:
+            return False
+        if rgb_frame.shape[:2] != (self.size, self.size):
+            rgb_frame = cv2.resize(rgb_frame, (self.size, self.size), interpolation=cv2.INTER_AREA)
+        record = memoryview(np.float64(timestamp).tobytes() + np.ascontiguousarray(rgb_frame, dtype=np.uint8).tobytes())
+        with self.lock, self._file_lock():
+            self._catch_up()
+            if key in self.seen:
+                return False
+            while record:
+                record = record[os.write(self.fd, record):]
+            self.scanned += self.itemsize
+            self.seen.add(key)
+        return True
+
+    def close(self):
+        with self.lock:
+            os.close(self.fd)
+
+
+class FrameStore:
+    """Sampled, model-resolution frames persisted per content hash.
+
+    Each hash gets a directory holding one file of fixed-size records, each
+    a float64 timestamp and a uint8 frame, so re-scoring jobs can
+    memory-map it and feed a new model without touching the source video.
+    """
+
+    def __init__(self, root: str = FRAME_STORE_DIR, size: int = FRAME_STORE_SIZE):
+        self.root = root
+        self.size = size
+        self._writers: Dict[str, _HashWriter] = {}
+        self._lock = threading.Lock()
+
+    def _writer(self, content_hash: str) -> _HashWriter:
+        with self._lock:
+            writer = self._writers.get(content_hash)
+            if writer is None:
+                writer = _HashWriter(os.path.join(self.root, content_hash), self.size)
+                self._writers[content_hash] = writer
+                logger.info(f"Storing sampled frames for {content_hash[:12]} ({len(writer.seen)} already stored)")
+            return writer
+
+    def add(self, content_hash: str, timestamp: float, rgb_frame: np.ndarray) -> bool:
+        """Persist one RGB frame; returns False if that timestamp is already stored"""
+        return self._writer(content_hash).add(timestamp, rgb_frame)
+
+    def release(self, content_hash: str):
+        """Close the writer for a hash no longer being decoded"""
+        with self._lock:
+            writer = self._writers.pop(content_hash, None)
+        if writer is not None:
+            writer.close()
+
+    def hashes(self) -> List[str]:
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(
+            d for d in os.listdir(self.root)
+            if os.path.exists(os.path.join(self.root, d, _RECORDS_FILE))
+        )
+
+    def open(self, content_hash: str) -> Tuple[np.ndarray, np.ndarray]:
+        """Memory-map (timestamps, frames) for a hash; frames is (N, size, size, 3)"""
+        directory = os.path.join(self.root, content_hash)
+        with open(os.path.join(directory, _META_FILE)) as f:
+            size = json.load(f)["size"]
+        dtype = record_dtype(size)
+        path = os.path.join(directory, _RECORDS_FILE)
+        # Whole records only: a writer may be part-way through the last one
+        count = os.path.getsize(path) // dtype.itemsize
+        if count == 0:
+            return np.empty(0, dtype=np.float64), np.empty((0, size, size, 3), dtype=np.uint8)
+        records = np.memmap(path, dtype=dtype, mode="r", shape=(count,))
+        return records["timestamp"], records["pixels"]
+
+    def iter_batches(self, content_hash: str, batch_size: int) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (timestamps, frames) batches in time order, straight from the mapping"""
+        timestamps, frames = self.open(content_hash)
+        order = np.argsort(timestamps, kind="stable")
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            yield timestamps[idx], frames[idx]
@@ -0,0 +1,232 @@
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import zlib
+from multiprocessing import shared_memory
+from multiprocessing.connection import Client
+from typing import List, Optional
+
+import numpy as np
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+MODEL_NAME = "perrytheplatypus/falconsai-finetuned-nsfw-detect"
+
+# Comma-separated Unix socket paths of inference servers. When set, HTTP
+# workers forward frames to these processes instead of loading the model.
+INFERENCE_SOCKETS = [p for p in os.environ.get("INFERENCE_SOCKETS", "").split(",") if p]
+# Shared secret for those sockets; serve.py generates one per deployment
+INFERENCE_AUTHKEY = os.environ.get("INFERENCE_AUTHKEY", "").encode()
+
+# Local copy of the model and image processor, saved after the first download
+# so restarts and new replicas load from disk without resolving the hub
+MODEL_CACHE_DIR = os.environ.get("MODEL_CACHE_DIR", "model_cache")
+# Replace the model with a constant answer after a fixed delay, to measure
+# framework and decode overhead in isolation (see loadtest.py)
+FAKE_CLASSIFIER = os.environ.get("FAKE_CLASSIFIER", "0") == "1"
+FAKE_CLASSIFIER_DELAY_MS = float(os.environ.get("FAKE_CLASSIFIER_DELAY_MS", "0"))
+# Batch sizes run once at startup so kernels are initialized before real traffic
+WARMUP_BATCH_SIZES = [int(b) for b in os.environ.get("WARMUP_BATCH_SIZES", "1").split(",") if b]
+
+
+def load_pipeline(model_name: str = MODEL_NAME, cache_dir: str = MODEL_CACHE_DIR):
+    """Build the transformers image-classification pipeline, preferring the local cache"""
+    # Imported here so HTTP workers in remote mode never load torch
+    from transformers import pipeline
+
+    local_path = os.path.join(cache_dir, model_name.replace("/", "--")) if cache_dir else None
+    if local_path and os.path.isdir(local_path):
+        logger.info(f"Loading classifier from local cache: {local_path}")
+        try:
+            return pipeline("image-classification", model=local_path)
+        except Exception as e:
+            logger.warning(f"Local cache {local_path} is unusable ({e}), loading {model_name} instead")
+
+    pipe = pipeline("image-classification", model=model_name)
+    if local_path:
+        # Save into a private directory and swap it in whole, so a crash or a
+        # concurrent loader never sees config.json without the weights
+        staging = None
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            staging = tempfile.mkdtemp(prefix=".staging-", dir=cache_dir)
+            pipe.save_pretrained(staging)
+            if os.path.isdir(local_path):
+                shutil.rmtree(local_path, ignore_errors=True)
+            os.replace(staging, local_path)
+            logger.info(f"Cached classifier at {local_path}")
+        except Exception as e:
+            logger.warning(f"Could not cache classifier at {local_path}: {e}")
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+    return pipe
+
+
+def warm_up(pipe, batch_sizes=None):
+    """Run dummy batches through the pipeline so the first request isn't slow"""
+    for batch_size in batch_sizes or WARMUP_BATCH_SIZES:
+        start = time.monotonic()
+        images = [Image.new("RGB", (224, 224)) for _ in range(batch_size)]
+        pipe(images, batch_size=batch_size)
+        logger.info(f"Warm-up batch of {batch_size} took {time.monotonic() - start:.2f}s")
+
+
+class LocalClassifier:
+    """Runs the model in this process"""
+
+    mode = "local"
+
+    def __init__(self, pipe):
+        self.pipe = pipe
+
+    def classify(self, rgb_frame: np.ndarray, session_id: str = None) -> dict:
+        """Return the top prediction for one RGB frame"""
+        return self.pipe(Image.fromarray(rgb_frame))[0]
+
+    def close(self):
+        pass
+
+
+class FakeClassifier:
+    """Stand-in for the model that always answers "normal" """
+
+    mode = "fake"
+
+    def __init__(self, delay_ms: float = 0.0):
+        self.delay = delay_ms / 1000.0
+
+    def classify(self, rgb_frame: np.ndarray, session_id: str = None) -> dict:
+        if self.delay:
+            time.sleep(self.delay)
+        return {"label": "normal", "score": 1.0}
+
+    def close(self):
+        pass
+
+
+class _Channel:
+    """One connection to an inference server plus its shared-memory frame slot"""
+
+    def __init__(self, address: str):
+        self.conn = Client(address, family="AF_UNIX", authkey=INFERENCE_AUTHKEY)
+        self.shm: Optional[shared_memory.SharedMemory] = None
+
+    def _ensure_capacity(self, nbytes: int):
+        if self.shm is not None and self.shm.size >= nbytes:
+            return
+        self._release_shm()
+        self.shm = shared_memory.SharedMemory(create=True, size=nbytes)
+
+    def request(self, rgb_frame: np.ndarray) -> dict:
+        frame = np.ascontiguousarray(rgb_frame, dtype=np.uint8)
+        self._ensure_capacity(frame.nbytes)
+        np.ndarray(frame.shape, dtype=np.uint8, buffer=self.shm.buf)[...] = frame
+        # Only the slot name and geometry cross the socket; pixels stay in shm
+        self.conn.send(("classify", self.shm.name, frame.shape))
+        status, payload = self.conn.recv()
+        if status != "ok":
+            raise RuntimeError(f"Inference server error: {payload}")
+        return payload
+
+    def _release_shm(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+    def close(self):
+        try:
+            self.conn.close()
+        finally:
+            self._release_shm()
+
+
+class RemoteClassifier:
+    """Forwards frames to dedicated inference server processes over local IPC.
+
+    Each server address gets a small pool of channels so several executor
+    threads can have requests in flight at once. A session is always routed
+    to the same server, keeping its requests on one set of cores.
+    """
+
+    mode = "remote"
+
+    def __init__(self, addresses: List[str], channels_per_server: int = 4):
+        self.addresses = addresses
+        self.channels_per_server = channels_per_server
+        self._pools = [queue.LifoQueue() for _ in addresses]
+        self._created = [0] * len(addresses)
+        self._lock = threading.Lock()
+
+    def _server_for(self, session_id: Optional[str]) -> int:
+        if session_id is None:
+            return 0
+        return zlib.crc32(session_id.encode()) % len(self.addresses)
+
+    def _get_channel(self, index: int) -> _Channel:
+        pool = self._pools[index]
+        while True:
+            try:
+                return pool.get_nowait()
+            except queue.Empty:
+                pass
+            with self._lock:
+                can_create = self._created[index] < self.channels_per_server
+                if can_create:
+                    self._created[index] += 1
+            if can_create:
+                try:
+                    return _Channel(self.addresses[index])
+                except Exception:
+                    with self._lock:
+                        self._created[index] -= 1
+                    raise
+            try:
+                return pool.get(timeout=0.1)
+            except queue.Empty:
+                continue
+
+    def classify(self, rgb_frame: np.ndarray, session_id: str = None) -> dict:
+        index = self._server_for(session_id)
+        channel = self._get_channel(index)
+        try:
+            result = channel.request(rgb_frame)
+        except Exception:
+            # Drop the broken channel; a fresh one is opened on next use
+            channel.close()
+            with self._lock:
+                self._created[index] -= 1
+            raise
+        self._pools[index].put(channel)
+        return result
+
+    def close(self):
+        for pool in self._pools:
+            while not pool.empty():
+                pool.get_nowait().close()
+
+
+def create_classifier():
+    """Build the classifier for this process, or None if it is unavailable"""
+    if FAKE_CLASSIFIER:
+        logger.info(f"Using fake classifier ({FAKE_CLASSIFIER_DELAY_MS}ms per frame)")
+        return FakeClassifier(FAKE_CLASSIFIER_DELAY_MS)
+    if INFERENCE_SOCKETS:
+        if not INFERENCE_AUTHKEY:
+            logger.error("INFERENCE_SOCKETS is set but INFERENCE_AUTHKEY is not")
+            return None
+        logger.info(f"Using remote inference servers: {INFERENCE_SOCKETS}")
+        return RemoteClassifier(INFERENCE_SOCKETS)
+    try:
+        pipe = load_pipeline()
+        logger.info("NSFW classifier loaded successfully")
+        warm_up(pipe)
+        return LocalClassifier(pipe)
+    except Exception as e:
+        logger.error(f"Failed to load classifier: {e}")
+        return None
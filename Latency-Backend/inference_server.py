@@ -0,0 +1,168 @@
+"""Dedicated inference process shared by several HTTP/WebSocket workers.
+
+Listens on a Unix socket, reads frames that clients place in shared memory,
+batches concurrent requests and runs them through the classifier on a
+pinned set of CPU cores.
+
+    python inference_server.py --socket /tmp/palanam-infer-0.sock --cores 0-3
+"""
+import argparse
+import logging
+import os
+import queue
+import threading
+import time
+from multiprocessing import resource_tracker, shared_memory
+from multiprocessing.connection import Listener
+
+import numpy as np
+from PIL import Image
+
+from inference import INFERENCE_AUTHKEY, load_pipeline, warm_up
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def parse_cores(spec: str):
+    """Parse a core list such as '0-3,8,10-11' into a set of ints"""
+    cores = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            start, end = part.split("-")
+            cores.update(range(int(start), int(end) + 1))
+        else:
+            cores.add(int(part))
+    return cores
+
+
+def pin_to_cores(cores):
+    """Restrict this process (and torch's intra-op pool) to the given cores"""
+    if not cores:
+        return
+    if hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, cores)
+        logger.info(f"Pinned inference server to cores {sorted(cores)}")
+    else:
+        logger.warning("CPU pinning not supported on this platform")
+    try:
+        import torch
+        torch.set_num_threads(len(cores))
+    except ImportError:
+        pass
+
+
+class InferenceServer:
+    def __init__(self, socket_path: str, batch_size: int = 8, max_wait_ms: float = 5.0):
+        self.socket_path = socket_path
+        self.batch_size = max(1, batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.requests = queue.Queue()
+        self.pipe = None
+        self.processed = 0
+
+    def _attach(self, attached: dict, name: str) -> shared_memory.SharedMemory:
+        shm = attached.get(name)
+        if shm is None:
+            shm = shared_memory.SharedMemory(name=name)
+            # The client owns the segment; stop our tracker from unlinking it
+            resource_tracker.unregister(shm._name, "shared_memory")
+            attached[name] = shm
+        return shm
+
+    def _serve_connection(self, conn):
+        """Read requests from one client; replies are sent by the batch loop"""
+        attached = {}
+        try:
+            while True:
+                try:
+                    op, name, shape = conn.recv()
+                except EOFError:
+                    break
+                if op != "classify":
+                    conn.send(("error", f"Unknown operation: {op}"))
+                    continue
+                try:
+                    # Drop segments the client has replaced with a larger one
+                    for stale in [n for n in attached if n != name]:
+                        attached.pop(stale).close()
+                    shm = self._attach(attached, name)
+                    frame = np.ndarray(shape, dtype=np.uint8, buffer=shm.buf)
+                    # Copy out so the client may reuse its slot after the reply
+                    image = Image.fromarray(frame.copy())
+                except Exception as e:
+                    conn.send(("error", str(e)))
+                    continue
+                self.requests.put((conn, image))
+        finally:
+            for shm in attached.values():
+                shm.close()
+            conn.close()
+
+    def _batch_loop(self):
+        """Collect up to batch_size requests, waiting at most max_wait for stragglers"""
+        while True:
+            batch = [self.requests.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self.requests.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            images = [image for _, image in batch]
+            try:
+                outputs = self.pipe(images, batch_size=len(images))
+                replies = [("ok", output[0]) for output in outputs]
+            except Exception as e:
+                logger.error(f"Batch inference failed: {e}")
+                replies = [("error", str(e))] * len(batch)
+
+            for (conn, _), reply in zip(batch, replies):
+                try:
+                    conn.send(reply)
+                except Exception as e:
+                    logger.warning(f"Could not deliver result to client: {e}")
+            self.processed += len(batch)
+
+    def serve_forever(self):
+        self.pipe = load_pipeline()
+        logger.info("NSFW classifier loaded successfully")
+        warm_up(self.pipe, sorted({1, self.batch_size}))
+
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        listener = Listener(self.socket_path, family="AF_UNIX", authkey=INFERENCE_AUTHKEY)
+        logger.info(f"Inference server listening on {self.socket_path} (batch size {self.batch_size})")
+
+        threading.Thread(target=self._batch_loop, daemon=True).start()
+        try:
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+        finally:
+            listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Shared NSFW inference server")
+    parser.add_argument("--socket", required=True, help="Unix socket path to listen on")
+    parser.add_argument("--cores", default="", help="CPU cores to pin to, e.g. 0-3")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--max-wait-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    if not INFERENCE_AUTHKEY:
+        parser.error("INFERENCE_AUTHKEY must be set in the environment")
+    pin_to_cores(parse_cores(args.cores))
+    InferenceServer(args.socket, args.batch_size, args.max_wait_ms).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
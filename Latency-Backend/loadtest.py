@@ -0,0 +1,252 @@
+"""WebSocket load generator that behaves like many VideoPlayer.jsx clients.
+
+Each simulated player uploads one of the bundled videos, opens
+/ws/{session_id}, sends "connect" and then a "process_frame" for the
+playhead every 500 ms while playing, with random seeks and pauses. Like a
+real player, the playhead drifts off the server's background sampling grid,
+and each request carries a request_id the server echoes back. Reports
+request-to-classification latency, late/shed/superseded/dropped results
+and overall throughput.
+
+    python loadtest.py --players 200 --duration 60
+    FAKE_CLASSIFIER=1 python main.py   # server side: isolate framework/decode cost
+"""
+import argparse
+import asyncio
+import glob
+import json
+import logging
+import mimetypes
+import os
+import random
+import time
+import urllib.request
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List
+
+import websockets
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PlayerStats:
+    upload_seconds: float = 0.0
+    sent: int = 0
+    latencies: List[float] = field(default_factory=list)
+    late: int = 0
+    busy: int = 0
+    superseded: int = 0
+    dropped: int = 0
+    background: int = 0
+    errors: int = 0
+
+
+def upload_video(base_url: str, path: str) -> str:
+    """POST a video to /upload-video/ and return its session ID (blocking)"""
+    boundary = uuid.uuid4().hex
+    content_type = mimetypes.guess_type(path)[0] or "video/mp4"
+    with open(path, "rb") as f:
+        data = f.read()
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{os.path.basename(path)}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode() + data + f"\r\n--{boundary}--\r\n".encode()
+    request = urllib.request.Request(
+        f"{base_url}/upload-video/",
+        data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}"},
+    )
+    with urllib.request.urlopen(request, timeout=120) as response:
+        return json.loads(response.read())["session_id"]
+
+
+class Player:
+    def __init__(self, args, video_path: str):
+        self.args = args
+        self.video_path = video_path
+        self.stats = PlayerStats()
+        self.playhead = 0.0
+        self.duration = None
+        # Request ID -> monotonic send time
+        self.pending: Dict[int, float] = {}
+        self.next_request_id = 0
+
+    async def run(self, deadline: float):
+        start = time.monotonic()
+        try:
+            session_id = await asyncio.to_thread(upload_video, self.args.base_url, self.video_path)
+        except Exception as e:
+            logger.error(f"Upload failed for {self.video_path}: {e}")
+            self.stats.errors += 1
+            return
+        self.stats.upload_seconds = time.monotonic() - start
+
+        ws_url = self.args.base_url.replace("http", "ws", 1) + f"/ws/{session_id}"
+        try:
+            async with websockets.connect(ws_url, max_size=None) as ws:
+                await ws.send(json.dumps({"type": "connect"}))
+                receiver = asyncio.create_task(self._receive(ws))
+                try:
+                    await self._play(ws, deadline)
+                    # Give in-flight requests a moment to come back
+                    await asyncio.sleep(self.args.late_threshold)
+                finally:
+                    receiver.cancel()
+        except Exception as e:
+            logger.error(f"WebSocket error for {session_id}: {e}")
+            self.stats.errors += 1
+        self.stats.dropped += len(self.pending)
+
+    async def _play(self, ws, deadline: float):
+        while self.duration is None and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+        interval = self.args.interval
+        paused_until = 0.0
+        while time.monotonic() < deadline and self.duration:
+            now = time.monotonic()
+            if now >= paused_until:
+                if random.random() < self.args.pause_prob:
+                    paused_until = now + random.uniform(1.0, self.args.max_pause)
+                elif random.random() < self.args.seek_prob:
+                    self.playhead = random.uniform(0, self.duration)
+                else:
+                    # Timers and frame boundaries keep currentTime off an exact grid
+                    self.playhead += interval + random.uniform(-0.02, 0.02)
+
+                if self.playhead >= self.duration:
+                    self.playhead = random.uniform(0, interval)
+
+                if now >= paused_until:
+                    timestamp = round(self.playhead, 3)
+                    request_id = self.next_request_id
+                    self.next_request_id += 1
+                    self.pending[request_id] = time.monotonic()
+                    self.stats.sent += 1
+                    await ws.send(json.dumps({
+                        "type": "process_frame",
+                        "timestamp": timestamp,
+                        "request_id": request_id
+                    }))
+            await asyncio.sleep(interval)
+
+    async def _receive(self, ws):
+        async for message in ws:
+            data = json.loads(message)
+            kind = data.get("type")
+            if kind == "video_info":
+                self.duration = data["duration"]
+            elif kind == "classification":
+                sent_at = self.pending.pop(data.get("request_id"), None)
+                if sent_at is None:
+                    self.stats.background += 1
+                    continue
+                self.stats.latencies.append(time.monotonic() - sent_at)
+                # Useless for skipping if the player has already moved past it
+                if abs(self.playhead - data["timestamp"]) > self.args.late_threshold:
+                    self.stats.late += 1
+            elif kind == "busy":
+                if self.pending.pop(data.get("request_id"), None) is not None:
+                    self.stats.busy += 1
+            elif kind == "superseded":
+                # Replaced by this player's newer playhead: coalescing, not loss
+                if self.pending.pop(data.get("request_id"), None) is not None:
+                    self.stats.superseded += 1
+            elif kind == "error":
+                self.stats.errors += 1
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def fetch_health(base_url: str) -> dict:
+    with urllib.request.urlopen(f"{base_url}/health", timeout=10) as response:
+        return json.loads(response.read())
+
+
+async def main_async(args):
+    videos = sorted(glob.glob(args.videos))
+    if not videos:
+        raise SystemExit(f"No videos match {args.videos}")
+
+    players = [Player(args, videos[i % len(videos)]) for i in range(args.players)]
+    start = time.monotonic()
+    deadline = start + args.ramp + args.duration
+
+    tasks = []
+    for i, player in enumerate(players):
+        tasks.append(asyncio.create_task(player.run(deadline)))
+        # Spread connections over the ramp-up period
+        await asyncio.sleep(args.ramp / max(1, args.players))
+    await asyncio.gather(*tasks)
+    elapsed = time.monotonic() - start
+
+    latencies = [l for p in players for l in p.stats.latencies]
+    totals = {name: sum(getattr(p.stats, name) for p in players)
+              for name in ("sent", "late", "busy", "superseded", "dropped", "background", "errors")}
+    uploads = [p.stats.upload_seconds for p in players if p.stats.upload_seconds]
+
+    report = {
+        "players": args.players,
+        "elapsed_seconds": round(elapsed, 1),
+        "requests_sent": totals["sent"],
+        "playhead_results": len(latencies),
+        "late_results": totals["late"],
+        "shed_busy": totals["busy"],
+        "superseded": totals["superseded"],
+        "dropped": totals["dropped"],
+        "background_results": totals["background"],
+        "errors": totals["errors"],
+        "results_per_second": round((len(latencies) + totals["background"]) / elapsed, 1),
+        "latency_ms": {
+            "p50": round(percentile(latencies, 50) * 1000, 1),
+            "p90": round(percentile(latencies, 90) * 1000, 1),
+            "p99": round(percentile(latencies, 99) * 1000, 1),
+            "max": round(max(latencies, default=0.0) * 1000, 1),
+        },
+        "upload_seconds_p50": round(percentile(uploads, 50), 2),
+    }
+    try:
+        report["server"] = await asyncio.to_thread(fetch_health, args.base_url)
+    except Exception as e:
+        logger.warning(f"Could not fetch /health: {e}")
+
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+
+def main():
+    default_videos = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "videos", "*.mp4")
+    parser = argparse.ArgumentParser(description="Simulate concurrent video players against the API")
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--videos", default=default_videos, help="Glob of videos to upload")
+    parser.add_argument("--players", type=int, default=50)
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds of playback per player")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Seconds over which players connect")
+    parser.add_argument("--interval", type=float, default=0.5, help="Seconds between playhead requests")
+    parser.add_argument("--seek-prob", type=float, default=0.02)
+    parser.add_argument("--pause-prob", type=float, default=0.01)
+    parser.add_argument("--max-pause", type=float, default=5.0)
+    parser.add_argument("--late-threshold", type=float, default=1.0,
+                        help="A result is late if the playhead moved further than this")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--output", default=None, help="Also write the report to this JSON file")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,30 +1,86 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket, WebSocketDisconnect, Request
+from fastapi.responses import FileResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
+from pydantic import BaseModel
 import os
 import uuid
+import hashlib
 import logging
 import asyncio
 import json
-from typing import Dict
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
 from pathlib import Path
 import cv2
-from transformers import pipeline
-from PIL import Image
 import numpy as np
 import time
+from concurrent.futures import ThreadPoolExecutor
+from capture_pool import CapturePool, file_content_hash
+from admission import AdmissionController, AdmissionSlot
+from inference import create_classifier
+from clip_analysis import CLIP_DURATION, ClipBatcher, create_temporal_classifier, open_clip_stream
+from timeline import SessionTimeline, merge_intervals, timeline_etag, to_webvtt
+from triage import triage_video
+from proxy import ProxyManager
+from tracing import Tracing
+from uploads import TooManyUploads, UploadBusy, UploadGone, UploadManager
+from frame_store import FRAME_STORE_DIR, FrameStore
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Initialize the classifier globally
-try:
-    classifier = pipeline("image-classification", model="perrytheplatypus/falconsai-finetuned-nsfw-detect")
-    logger.info("NSFW classifier loaded successfully")
-except Exception as e:
-    logger.error(f"Failed to load classifier: {e}")
-    classifier = None
+# The classifier (the model itself, or a client for the shared inference
+# servers when INFERENCE_SOCKETS is set, see serve.py) is built by the app
+# lifespan hook. Loading runs in the background unless MODEL_LOAD_BLOCKING is
+# set, so the server accepts connections while the model loads and warms up.
+MODEL_LOAD_BLOCKING = os.environ.get("MODEL_LOAD_BLOCKING", "0") == "1"
+classifier = None
+classifier_state = {"status": "loading", "load_seconds": None}
+classifier_ready = asyncio.Event()
+
+async def load_classifier():
+    """Build and warm up the classifier off the event loop"""
+    global classifier
+    start = time.monotonic()
+    classifier = await asyncio.to_thread(create_classifier)
+    if classifier is None:
+        classifier_state["status"] = "failed"
+    else:
+        classifier_state["status"] = "loaded" if classifier.mode == "local" else classifier.mode
+    classifier_state["load_seconds"] = round(time.monotonic() - start, 2)
+    classifier_ready.set()
+    logger.info(f"Classifier {classifier_state['status']} after {classifier_state['load_seconds']}s")
+
+# Optional temporal model for clip-level analysis (see clip_analysis.py),
+# loaded the same way and shared by all sessions through one batcher
+clip_batcher = None
+clip_classifier_state = {"status": "loading"}
+clip_classifier_ready = asyncio.Event()
+
+async def load_clip_classifier():
+    """Build the temporal clip model off the event loop, if configured"""
+    global clip_batcher
+    model = await asyncio.to_thread(create_temporal_classifier)
+    if model is not None:
+        clip_batcher = ClipBatcher(model)
+        clip_classifier_state["status"] = "loaded"
+    else:
+        clip_classifier_state["status"] = "unavailable"
+    clip_classifier_ready.set()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    load_task = asyncio.create_task(load_classifier())
+    clip_load_task = asyncio.create_task(load_clip_classifier())
+    if MODEL_LOAD_BLOCKING:
+        await asyncio.gather(load_task, clip_load_task)
+    sweep_task = asyncio.create_task(sweep_uploads())
+    yield
+    sweep_task.cancel()
+    frame_executor.shutdown(wait=False, cancel_futures=True)
+    if classifier is not None:
+        classifier.close()
 
 # CORS origins
 origins = [
@@ -34,7 +90,7 @@ origins = [
     "http://127.0.0.1:3000",
 ]
 
-app = FastAPI(title="Real-time NSFW Video Detector API", version="3.0.0")
+app = FastAPI(title="Real-time NSFW Video Detector API", version="3.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -58,13 +114,98 @@ SUPPORTED_FORMATS = {
     'video/webm': '.webm'
 }
 
+# Upper bound on simultaneously open decoders across all sessions
+MAX_OPEN_CAPTURES = int(os.environ.get("MAX_OPEN_CAPTURES", "32"))
+
+# Admission control: concurrent frame inferences server-wide and per session,
+# and the share of global slots background sweeps may occupy
+MAX_INFLIGHT = int(os.environ.get("MAX_INFLIGHT", "4"))
+SESSION_MAX_INFLIGHT = int(os.environ.get("SESSION_MAX_INFLIGHT", "2"))
+BACKGROUND_MAX_INFLIGHT = int(os.environ.get("BACKGROUND_MAX_INFLIGHT", "2"))
+# Frame decode + inference threads; admission keeps at most MAX_INFLIGHT busy,
+# and a slot is only returned once its thread has finished
+frame_executor = ThreadPoolExecutor(max_workers=max(1, MAX_INFLIGHT), thread_name_prefix="frame")
+# Playhead requests not started within this many seconds are shed
+PLAYHEAD_DEADLINE = float(os.environ.get("PLAYHEAD_DEADLINE", "1.0"))
+# Base background sampling interval in seconds, widened under load
+PROCESSING_INTERVAL = 0.5
+# How often a changed timeline is mirrored to disk, where any worker can serve it
+TIMELINE_SNAPSHOT_INTERVAL = 1.0
+
+# Optionally, after upload, transcode a short-GOP, model-resolution proxy in
+# the background and switch sessions' decoders over to it once ready. Each
+# transcode occupies a core, so only PROXY_MAX_TRANSCODES run at a time.
+ENABLE_PROXY = os.environ.get("ENABLE_PROXY", "0") == "1"
+PROXY_SIZE = int(os.environ.get("PROXY_SIZE", "224"))
+PROXY_GOP = int(os.environ.get("PROXY_GOP", "1"))
+PROXY_MAX_TRANSCODES = int(os.environ.get("PROXY_MAX_TRANSCODES", "1"))
+proxies = ProxyManager(TEMP_DIR, size=PROXY_SIZE, gop=PROXY_GOP, max_concurrent=PROXY_MAX_TRANSCODES)
+
+# Opt-in per-session tracing (?trace=true, or TRACE_SAMPLE_RATE), written as
+# Chrome trace-event JSON to TRACE_DIR when the session ends
+tracing = Tracing()
+
+# Resumable chunked uploads (see /uploads endpoints). Playback can start once
+# this many leading bytes have arrived, enough for a faststart MP4's header
+# and first frames; byte offsets are mapped to time with a safety margin.
+# Uploads idle for UPLOAD_TTL seconds are aborted, and at most
+# MAX_OPEN_UPLOADS may be open at once. Until commit verifies the declared
+# checksum, a session's decoder is keyed by its upload, not that checksum.
+UPLOAD_TTL = float(os.environ.get("UPLOAD_TTL", "900"))
+MAX_OPEN_UPLOADS = int(os.environ.get("MAX_OPEN_UPLOADS", "16"))
+uploads = UploadManager(TEMP_DIR, ttl=UPLOAD_TTL, max_open=MAX_OPEN_UPLOADS)
+UPLOAD_START_BYTES = int(os.environ.get("UPLOAD_START_BYTES", str(2 * 1024 * 1024)))
+UPLOAD_READ_MARGIN = 0.02
+MAX_UPLOAD_SIZE = 100 * 1024 * 1024
+UPLOAD_SWEEP_INTERVAL = 60.0
+
+# Traced chunked uploads this worker has served parts of
+traced_uploads = set()
+
+def upload_trace_key(upload_id: str) -> str:
+    """Tracer key of a chunked upload, kept apart from its WebSocket session's.
+
+    Finishing it writes trace_<upload_id>_upload.json, as /upload-video/ does.
+    """
+    return f"{upload_id}_upload"
+
+async def sweep_uploads():
+    while True:
+        await asyncio.sleep(UPLOAD_SWEEP_INTERVAL)
+        try:
+            await uploads.sweep()
+            # Parts this worker traced for uploads committed or aborted elsewhere
+            for upload_id in list(traced_uploads):
+                if await asyncio.to_thread(uploads.in_progress, upload_id) is None:
+                    traced_uploads.discard(upload_id)
+                    tracing.finish(upload_trace_key(upload_id), str(os.getpid()))
+        except Exception as e:
+            logger.error(f"Upload sweep failed: {e}")
+
+# Optionally keep every sampled frame at model resolution, keyed by content
+# hash, so rescore.py can re-run new models without decoding the videos again
+frame_store = FrameStore(FRAME_STORE_DIR) if FRAME_STORE_DIR else None
+
 class ConnectionManager:
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
-        self.video_captures: Dict[str, cv2.VideoCapture] = {}
+        self.capture_pool = CapturePool(max_open=MAX_OPEN_CAPTURES)
+        self.content_hashes: Dict[str, str] = {}
         self.video_info: Dict[str, dict] = {}
         self.processing_tasks: Dict[str, asyncio.Task] = {}
+        self.clip_tasks: Dict[str, asyncio.Task] = {}
+        self.timelines: Dict[str, SessionTimeline] = {}
+        self.snapshot_tasks: Dict[str, asyncio.Task] = {}
         self.video_paths: Dict[str, str] = {}
+        self.admission = AdmissionController(
+            global_limit=MAX_INFLIGHT,
+            session_limit=SESSION_MAX_INFLIGHT,
+            background_limit=BACKGROUND_MAX_INFLIGHT
+        )
+        self.pending_playheads: Dict[str, tuple] = {}
+        self.playhead_events: Dict[str, asyncio.Event] = {}
+        self.playhead_tasks: Dict[str, asyncio.Task] = {}
+        self.coalesced_playheads = 0
 
     async def connect(self, websocket: WebSocket, session_id: str):
         await websocket.accept()
@@ -87,50 +228,78 @@ class ConnectionManager:
                 task.cancel()
                 logger.info(f"Cancelled processing task for {session_id}")
             del self.processing_tasks[session_id]
+
+        # Stop clip analysis
+        if session_id in self.clip_tasks:
+            task = self.clip_tasks.pop(session_id)
+            if not task.done():
+                task.cancel()
+                logger.info(f"Cancelled clip analysis task for {session_id}")
+        self.timelines.pop(session_id, None)
+        # The snapshot task deletes its file once any in-flight write is done
+        if session_id in self.snapshot_tasks:
+            self.snapshot_tasks.pop(session_id).cancel()
+
+        # Stop playhead worker and drop any request it had not started
+        if session_id in self.playhead_tasks:
+            task = self.playhead_tasks.pop(session_id)
+            if not task.done():
+                task.cancel()
+        self.pending_playheads.pop(session_id, None)
+        self.playhead_events.pop(session_id, None)
         
         # Close WebSocket connection
         if session_id in self.active_connections:
             del self.active_connections[session_id]
             logger.info(f"Removed WebSocket connection for {session_id}")
         
-        # Clean up video capture
-        if session_id in self.video_captures:
+        # Release this session's hold on its pooled video capture
+        if session_id in self.content_hashes:
             try:
-                self.video_captures[session_id].release()
+                self.capture_pool.unregister(session_id)
                 logger.info(f"Released video capture for {session_id}")
             except Exception as e:
                 logger.error(f"Error releasing video capture for {session_id}: {e}")
-            del self.video_captures[session_id]
+            content_hash = self.content_hashes.pop(session_id)
+            if ENABLE_PROXY and not content_hash.startswith("upload:"):
+                # Sessions on other workers may still read the proxy; it is
+                # deleted with the last lease on any of them
+                released = asyncio.get_running_loop().run_in_executor(
+                    None, proxies.release, content_hash, session_id
+                )
+                released.add_done_callback(lambda f, h=content_hash: self._proxy_released(h, f))
+            if content_hash not in self.content_hashes.values() and frame_store:
+                frame_store.release(content_hash)
         
         # Clean up video info
         if session_id in self.video_info:
             del self.video_info[session_id]
             logger.info(f"Cleaned up video info for {session_id}")
-        
-        # Clean up video path
-        if session_id in self.video_paths:
-            video_path = self.video_paths[session_id]
-            try:
-                if os.path.exists(video_path):
-                    os.remove(video_path)
-                    logger.info(f"Deleted video file: {video_path}")
-            except Exception as e:
-                logger.error(f"Error deleting video file {video_path}: {e}")
-            del self.video_paths[session_id]
+
+        tracing.finish(session_id)
+
+        # Deleting files consults the upload sidecar, so it runs off the event loop
+        video_path = self.video_paths.pop(session_id, None)
+        asyncio.get_running_loop().run_in_executor(None, remove_session_files, session_id, video_path)
             
         logger.info(f"Completed disconnect cleanup for session: {session_id}")
 
-    async def send_message(self, session_id: str, data: dict):
+    async def send_message(self, session_id: str, data: dict, track: str = "messages"):
         if session_id in self.active_connections:
             try:
-                await self.active_connections[session_id].send_text(json.dumps(data))
+                with tracing.span(session_id, track, "send_text", type=data["type"]):
+                    await self.active_connections[session_id].send_text(json.dumps(data))
                 logger.debug(f"Sent message to {session_id}: {data['type']}")
             except Exception as e:
                 logger.error(f"Error sending message to {session_id}: {e}")
                 self.disconnect(session_id)
 
-    def initialize_video(self, session_id: str, video_path: str):
-        """Initialize video capture for a session with enhanced logging"""
+    def initialize_video(self, session_id: str, video_path: str, content_hash: str):
+        """Initialize video capture for a session with enhanced logging.
+
+        ``content_hash`` keys the shared decoder; it is computed at upload
+        time (or off the event loop) so connecting never hashes the file here.
+        """
         logger.info(f"Initializing video for session {session_id}")
         logger.info(f"Video path: {video_path}")
         logger.info(f"File exists: {os.path.exists(video_path)}")
@@ -165,10 +334,12 @@ class ConnectionManager:
             
             logger.info(f"Successfully read first frame: {frame.shape}")
             
-            # Reset to beginning
-            cap.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            # The probe capture is not kept; frames are decoded through the
+            # shared pool, which opens (and evicts) captures on demand
+            cap.release()
 
-            self.video_captures[session_id] = cap
+            self.capture_pool.register(session_id, video_path, content_hash)
+            self.content_hashes[session_id] = content_hash
             self.video_paths[session_id] = video_path
             self.video_info[session_id] = {
                 "fps": fps,
@@ -177,8 +348,9 @@ class ConnectionManager:
                 "width": width,
                 "height": height
             }
+            self.timelines[session_id] = SessionTimeline()
 
-            logger.info(f"Video successfully initialized for {session_id}: FPS={fps}, Duration={duration:.2f}s")
+            logger.info(f"Video successfully initialized for {session_id}: FPS={fps}, Duration={duration:.2f}s, Hash={content_hash[:12]}")
             return True
             
         except Exception as e:
@@ -188,8 +360,57 @@ class ConnectionManager:
             logger.error(f"Traceback: {traceback.format_exc()}")
             return False
 
-    async def process_frame_at_timestamp(self, session_id: str, timestamp: float):
-        """Process a specific frame at given timestamp with enhanced logging"""
+    def _classify_frame(self, session_id: str, frame_number: int, track: str):
+        """Decode and classify one frame; blocking, so run off the event loop"""
+        def span(name):
+            return tracing.span(session_id, track, name)
+
+        # Read frame (the pool seeks only when the position changed)
+        ret, frame = self.capture_pool.read_frame(session_id, frame_number, span)
+        if not ret:
+            logger.warning(f"Could not read frame {frame_number} for {session_id}")
+            return None
+
+        logger.debug(f"Successfully read frame {frame_number}: {frame.shape}")
+
+        # Convert BGR to RGB for the model
+        with span("cvtColor"):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+        content_hash = self.content_hashes[session_id]
+        if frame_store and not content_hash.startswith("upload:"):
+            with span("frame_store"):
+                try:
+                    timestamp = frame_number / self.video_info[session_id]["fps"]
+                    frame_store.add(content_hash, timestamp, rgb_frame)
+                except Exception as e:
+                    logger.error(f"Error storing frame {frame_number} for {session_id}: {e}")
+
+        # Get classification
+        logger.debug(f"Running classification for frame {frame_number}")
+        with span("inference"):
+            return classifier.classify(rgb_frame, session_id)
+
+    async def process_frame_at_timestamp(self, session_id: str, timestamp: float, track: str = "playhead",
+                                         slot: AdmissionSlot = None, request_id=None):
+        """Process a specific frame at given timestamp with enhanced logging.
+
+        Callers are expected to hold an admission ``slot`` for the session;
+        it is kept until the decode/inference thread finishes, even if this
+        coroutine is cancelled first. ``track`` names the trace track the
+        stages are recorded under. A client-supplied ``request_id`` is echoed
+        in the reply so it can tell its answer from background results.
+        """
+        echo = {"request_id": request_id} if request_id is not None else {}
+        if not classifier_ready.is_set():
+            await self.send_message(session_id, {
+                "type": "busy",
+                "timestamp": timestamp,
+                "message": "Model is still loading",
+                **echo
+            })
+            return
+
         if not classifier:
             logger.error(f"Classifier not available for session {session_id}")
             await self.send_message(session_id, {
@@ -198,7 +419,7 @@ class ConnectionManager:
             })
             return
 
-        if session_id not in self.video_captures:
+        if session_id not in self.content_hashes:
             logger.error(f"Video not initialized for session {session_id}")
             await self.send_message(session_id, {
                 "type": "error",
@@ -207,7 +428,6 @@ class ConnectionManager:
             return
 
         try:
-            cap = self.video_captures[session_id]
             video_info = self.video_info[session_id]
             
             # Calculate frame number from timestamp
@@ -217,27 +437,29 @@ class ConnectionManager:
             if frame_number >= video_info["total_frames"]:
                 logger.warning(f"Frame {frame_number} beyond video length for {session_id}")
                 return
+
+            # Mid-upload, only frames inside the contiguous prefix are readable
+            available = 1.0
+            if self.content_hashes[session_id].startswith("upload:"):
+                available = await asyncio.to_thread(uploads.available_fraction, session_id)
+            if available < 1.0 and frame_number / video_info["total_frames"] + UPLOAD_READ_MARGIN > available:
+                await self.send_message(session_id, {
+                    "type": "busy",
+                    "timestamp": timestamp,
+                    "message": "Frame not uploaded yet",
+                    **echo
+                }, track)
+                return
             
             logger.debug(f"Processing frame {frame_number} at {timestamp:.2f}s for {session_id}")
-            
-            # Set video position
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_number)
-            
-            # Read frame
-            ret, frame = cap.read()
-            if not ret:
-                logger.warning(f"Could not read frame {frame_number} for {session_id}")
-                return
-
-            logger.debug(f"Successfully read frame {frame_number}: {frame.shape}")
 
-            # Convert BGR to RGB for PIL
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(rgb_frame)
-
-            # Get classification
-            logger.debug(f"Running classification for frame {frame_number}")
-            result = classifier(pil_image)[0]
+            with tracing.span(session_id, track, "process_frame", frame=frame_number, timestamp=timestamp):
+                future = frame_executor.submit(self._classify_frame, session_id, frame_number, track)
+                if slot is not None:
+                    slot.hold_until(future)
+                result = await asyncio.wrap_future(future)
+            if result is None:
+                return
             
             classification_data = {
                 "type": "classification",
@@ -245,11 +467,20 @@ class ConnectionManager:
                 "frame": frame_number,
                 "label": result["label"],
                 "confidence": float(result["score"]),
-                "is_nsfw": result["label"].lower() != "normal"
+                "is_nsfw": result["label"].lower() != "normal",
+                **echo
             }
 
+            self.timelines[session_id].add_frame(
+                frame_number,
+                timestamp,
+                classification_data["label"],
+                classification_data["confidence"],
+                classification_data["is_nsfw"]
+            )
+
             # Send classification to frontend
-            await self.send_message(session_id, classification_data)
+            await self.send_message(session_id, classification_data, track)
             
             logger.info(f"CLASSIFICATION - Session: {session_id}, Frame: {frame_number}, Time: {timestamp:.2f}s, Result: {result['label']} ({result['score']:.3f})")
 
@@ -262,6 +493,70 @@ class ConnectionManager:
                 "message": f"Frame processing error: {str(e)}"
             })
 
+    async def _supersede_playhead(self, session_id: str, timestamp: float, request_id):
+        """Tell the client a request it tagged was replaced by a newer one and will get no result"""
+        self.coalesced_playheads += 1
+        logger.debug(f"Coalesced playhead request at {timestamp:.2f}s for {session_id}")
+        if request_id is not None:
+            await self.send_message(session_id, {
+                "type": "superseded",
+                "timestamp": timestamp,
+                "request_id": request_id
+            }, "playhead")
+
+    async def submit_playhead(self, session_id: str, timestamp: float, request_id=None):
+        """Queue a playhead request, replacing any older one not yet started"""
+        replaced = self.pending_playheads.get(session_id)
+        self.pending_playheads[session_id] = (timestamp, time.monotonic(), request_id)
+
+        if session_id not in self.playhead_events:
+            self.playhead_events[session_id] = asyncio.Event()
+        self.playhead_events[session_id].set()
+
+        task = self.playhead_tasks.get(session_id)
+        if task is None or task.done():
+            self.playhead_tasks[session_id] = asyncio.create_task(self._playhead_worker(session_id))
+        if replaced is not None:
+            await self._supersede_playhead(session_id, replaced[0], replaced[2])
+
+    async def _playhead_worker(self, session_id: str):
+        """Serve the newest playhead request for a session, one at a time"""
+        event = self.playhead_events[session_id]
+        try:
+            while session_id in self.active_connections:
+                await event.wait()
+                event.clear()
+                if session_id not in self.pending_playheads:
+                    continue
+
+                timestamp, received_at, request_id = self.pending_playheads.pop(session_id)
+                remaining = PLAYHEAD_DEADLINE - (time.monotonic() - received_at)
+                slot = None
+                with tracing.span(session_id, "playhead", "admission_wait"):
+                    if remaining > 0:
+                        slot = await self.admission.acquire(session_id, timeout=remaining)
+                if slot is None:
+                    logger.warning(f"Shedding playhead request at {timestamp:.2f}s for {session_id}: server busy")
+                    await self.send_message(session_id, {
+                        "type": "busy",
+                        "timestamp": timestamp,
+                        "message": "Server busy, frame skipped",
+                        **({"request_id": request_id} if request_id is not None else {})
+                    })
+                    continue
+
+                # A newer playhead may have arrived while waiting for a slot
+                if session_id in self.pending_playheads:
+                    await self._supersede_playhead(session_id, timestamp, request_id)
+                    timestamp, received_at, request_id = self.pending_playheads.pop(session_id)
+
+                try:
+                    await self.process_frame_at_timestamp(session_id, timestamp, slot=slot, request_id=request_id)
+                finally:
+                    slot.release()
+        except asyncio.CancelledError:
+            logger.debug(f"Playhead worker cancelled for session {session_id}")
+
     async def start_continuous_processing(self, session_id: str):
         """Start continuous processing of video frames"""
         logger.info(f"Starting continuous processing for session {session_id}")
@@ -272,14 +567,39 @@ class ConnectionManager:
         
         video_info = self.video_info[session_id]
         duration = video_info["duration"]
-        processing_interval = 0.5  # Process every 0.5 seconds
         
-        logger.info(f"Will process {duration / processing_interval:.0f} frames over {duration:.1f}s")
+        logger.info(f"Will process up to {duration / PROCESSING_INTERVAL:.0f} frames over {duration:.1f}s")
         
         try:
+            await classifier_ready.wait()
             current_time = 0.0
+            degraded = False
             while current_time < duration and session_id in self.active_connections:
-                await self.process_frame_at_timestamp(session_id, current_time)
+                # While the upload is still arriving, follow its contiguous prefix
+                if self.content_hashes.get(session_id, "").startswith("upload:"):
+                    upload = await asyncio.to_thread(uploads.in_progress, session_id)
+                    if upload is not None:
+                        needed = min(1.0, current_time / duration + UPLOAD_READ_MARGIN)
+                        await uploads.wait_for_bytes(session_id, int(upload.size * needed))
+                    await self.adopt_verified_hash(session_id)
+
+                # Background sweeps yield to live playheads and thin out under load
+                with tracing.span(session_id, "background", "admission_wait"):
+                    slot = await self.admission.acquire(session_id, background=True)
+                try:
+                    await self.process_frame_at_timestamp(session_id, current_time, "background", slot)
+                finally:
+                    slot.release()
+
+                processing_interval = self.admission.sampling_interval(PROCESSING_INTERVAL)
+                if (processing_interval > PROCESSING_INTERVAL) != degraded:
+                    degraded = not degraded
+                    logger.info(f"Background sampling for {session_id} {'widened' if degraded else 'restored'} to {processing_interval:.2f}s")
+                    await self.send_message(session_id, {
+                        "type": "degraded",
+                        "active": degraded,
+                        "sampling_interval": processing_interval
+                    })
                 current_time += processing_interval
                 
                 # Small delay to prevent overwhelming
@@ -296,7 +616,207 @@ class ConnectionManager:
                 "message": f"Processing error: {str(e)}"
             })
 
+    async def adopt_verified_hash(self, session_id: str):
+        """Move a chunked-upload session onto its content hash once commit verified it.
+
+        The commit may have been handled by another worker; the verified hash
+        is then picked up from the file it recorded.
+        """
+        if not self.content_hashes.get(session_id, "").startswith("upload:"):
+            return
+        content_hash = await asyncio.to_thread(verified_upload_hash, session_id)
+        # The session may have gone, or been moved over, while reading
+        if content_hash is None or not self.content_hashes.get(session_id, "").startswith("upload:"):
+            return
+        self.capture_pool.rekey(session_id, content_hash)
+        self.content_hashes[session_id] = content_hash
+        logger.info(f"Upload for {session_id} verified, decoding as {content_hash[:12]}")
+        await self.attach_proxy(session_id)
+
+    async def attach_proxy(self, session_id: str):
+        """Lease the proxy of a session's (verified) content and decode from it once it exists.
+
+        Partial uploads get theirs once commit verified them.
+        """
+        content_hash = self.content_hashes.get(session_id, "")
+        if not ENABLE_PROXY or content_hash.startswith("upload:"):
+            return
+        # Leased before looking, so no worker deletes it in between
+        await asyncio.to_thread(proxies.acquire, content_hash, session_id)
+        if session_id not in self.video_paths:
+            return
+        # No-op if one is already finished or being made here; if another
+        # worker is making it, this waits for that one and then switches
+        proxies.start(content_hash, self.video_paths[session_id])
+        proxy_path = proxies.get(content_hash)
+        if proxy_path:
+            self.capture_pool.set_source(content_hash, proxy_path)
+
+    def _proxy_released(self, content_hash: str, released: asyncio.Future):
+        if released.exception() is not None:
+            logger.error(f"Error releasing proxy lease for {content_hash[:12]}: {released.exception()}")
+        elif released.result() and content_hash not in self.content_hashes.values():
+            proxies.cancel(content_hash)
+
+    async def snapshot_timeline(self, session_id: str):
+        """Mirror a session's timeline to disk while it is active"""
+        written = None
+        pending = None
+        try:
+            while session_id in self.timelines:
+                snapshot = self.timelines[session_id].snapshot()
+                if snapshot["version"] != written:
+                    snapshot["content_hash"] = self.content_hashes[session_id]
+                    snapshot["duration"] = self.video_info[session_id]["duration"]
+                    pending = asyncio.ensure_future(asyncio.to_thread(write_timeline_snapshot, session_id, snapshot))
+                    await asyncio.shield(pending)
+                    written = snapshot["version"]
+                await asyncio.sleep(TIMELINE_SNAPSHOT_INTERVAL)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error(f"Error writing timeline snapshot for {session_id}: {e}")
+        finally:
+            if pending is not None and not pending.done():
+                await asyncio.wait([pending])
+            try:
+                os.remove(timeline_snapshot_path(session_id))
+            except FileNotFoundError:
+                pass
+
+    def switch_to_proxy(self, content_hash: str, proxy_path: str):
+        """Move active sessions' decoder for this content onto its new proxy"""
+        if content_hash in self.content_hashes.values():
+            self.capture_pool.set_source(content_hash, proxy_path)
+            logger.info(f"Switched decoder for {content_hash[:12]} to proxy {proxy_path}")
+
+    async def start_clip_analysis(self, session_id: str):
+        """Stream overlapping clips through the temporal model as they are decoded"""
+        await clip_classifier_ready.wait()
+        if clip_batcher is None:
+            logger.warning(f"Clip analysis requested for {session_id} but no temporal model is loaded")
+            await self.send_message(session_id, {
+                "type": "clip_analysis",
+                "status": "unavailable"
+            })
+            return
+
+        # Clips are decoded sequentially to the end, so wait for every byte
+        if self.content_hashes.get(session_id, "").startswith("upload:"):
+            upload = await asyncio.to_thread(uploads.in_progress, session_id)
+            if upload is not None:
+                await uploads.wait_for_bytes(session_id, upload.size)
+        # The client may have gone while this waited; nothing awaits this task
+        if session_id not in self.video_info:
+            logger.info(f"Session {session_id} ended before clip analysis started")
+            return
+
+        logger.info(f"Starting clip analysis for session {session_id}")
+        duration = self.video_info[session_id]["duration"]
+        clips = open_clip_stream(self.video_paths[session_id])
+        try:
+            while session_id in self.active_connections:
+                # Decode the next clip on the clip decode pool; results are sent
+                # as each clip completes rather than after the whole file
+                item = await clips.next()
+                if item is None:
+                    break
+                start_time, frames = item
+                result = await clip_batcher.classify(frames)
+
+                end_time = min(start_time + CLIP_DURATION, duration)
+                is_nsfw = result["label"].lower() != "normal"
+                self.timelines[session_id].add_clip(start_time, end_time, result["label"], result["score"], is_nsfw)
+                await self.send_message(session_id, {
+                    "type": "clip_classification",
+                    "start": start_time,
+                    "end": end_time,
+                    "label": result["label"],
+                    "confidence": result["score"],
+                    "is_nsfw": is_nsfw
+                })
+                logger.info(f"CLIP - Session: {session_id}, {start_time:.1f}-{end_time:.1f}s, Result: {result['label']} ({result['score']:.3f})")
+
+            logger.info(f"Completed clip analysis for session {session_id}")
+
+        except asyncio.CancelledError:
+            logger.info(f"Clip analysis cancelled for session {session_id}")
+        except Exception as e:
+            logger.error(f"Error in clip analysis for {session_id}: {e}")
+            await self.send_message(session_id, {
+                "type": "error",
+                "message": f"Clip analysis error: {str(e)}"
+            })
+        finally:
+            clips.close()
+
 manager = ConnectionManager()
+proxies.add_listener(manager.switch_to_proxy)
+
+def hash_sidecar_path(session_id: str) -> str:
+    """File holding the content hash recorded for a session's upload"""
+    return os.path.join(TEMP_DIR, f"hash_{session_id}")
+
+def write_session_hash(session_id: str, content_hash: str):
+    with open(hash_sidecar_path(session_id), "w") as f:
+        f.write(content_hash)
+
+def session_content_hash(session_id: str, video_path: str) -> str:
+    """Content hash recorded at upload time, hashing the file only if there is none"""
+    try:
+        with open(hash_sidecar_path(session_id)) as f:
+            content_hash = f.read().strip()
+        if len(content_hash) == 64:
+            return content_hash
+    except FileNotFoundError:
+        pass
+    return file_content_hash(video_path)
+
+def verified_upload_hash(session_id: str) -> Optional[str]:
+    """Hash recorded by a committed chunked upload, or None while it is still open"""
+    if uploads.in_progress(session_id) is not None:
+        return None
+    try:
+        with open(hash_sidecar_path(session_id)) as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        return None
+
+def remove_session_files(session_id: str, video_path: Optional[str]):
+    """Delete a finished session's video and sidecars; blocking, so run off the event loop"""
+    try:
+        uploads.forget(session_id)
+        # A chunked upload still being written keeps its file for a reconnect
+        if video_path and os.path.exists(video_path) and uploads.in_progress(session_id) is None:
+            os.remove(video_path)
+            logger.info(f"Deleted video file: {video_path}")
+            if os.path.exists(hash_sidecar_path(session_id)):
+                os.remove(hash_sidecar_path(session_id))
+    except Exception as e:
+        logger.error(f"Error deleting files for session {session_id}: {e}")
+
+def timeline_snapshot_path(session_id: str) -> str:
+    return os.path.join(TEMP_DIR, f"timeline_{session_id}.json")
+
+def write_timeline_snapshot(session_id: str, snapshot: dict):
+    path = timeline_snapshot_path(session_id)
+    with open(path + ".tmp", "w") as f:
+        json.dump(snapshot, f)
+    os.replace(path + ".tmp", path)
+
+def read_timeline_snapshot(session_id: str) -> Optional[dict]:
+    try:
+        with open(timeline_snapshot_path(session_id)) as f:
+            return json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+def find_session_video(session_id: str):
+    """Path of the uploaded video for a session, or None"""
+    video_files = [f for f in os.listdir(TEMP_DIR) if f.startswith(f"video_{session_id}")]
+    logger.info(f"Looking for video files with pattern: video_{session_id}*")
+    logger.info(f"Found files: {video_files}")
+    return os.path.join(TEMP_DIR, video_files[0]) if video_files else None
 
 @app.get("/")
 def root():
@@ -309,16 +829,27 @@ def root():
 @app.get("/health")
 def health_check():
     """Health check endpoint"""
-    classifier_status = "loaded" if classifier else "failed"
     return {
-        "status": "healthy", 
-        "classifier": classifier_status,
-        "active_connections": len(manager.active_connections)
+        "status": "healthy" if classifier_ready.is_set() else "starting",
+        "ready": classifier is not None,
+        "classifier": classifier_state["status"],
+        "classifier_load_seconds": classifier_state["load_seconds"],
+        "clip_classifier": clip_classifier_state["status"],
+        "active_connections": len(manager.active_connections),
+        "capture_pool": manager.capture_pool.stats(),
+        "admission": {
+            **manager.admission.stats(),
+            "coalesced_playheads": manager.coalesced_playheads
+        }
     }
 
 @app.post("/upload-video/")
-async def upload_video(file: UploadFile = File(...)):
-    """Upload video and return session ID with enhanced logging"""
+async def upload_video(file: UploadFile = File(...), trace: bool = False):
+    """Upload video and return session ID with enhanced logging.
+
+    Pass ``?trace=true`` to trace this upload; its trace is written as soon
+    as the upload is answered (trace the session itself with ``/ws?trace=``).
+    """
     logger.info(f"=== VIDEO UPLOAD STARTED ===")
     logger.info(f"Filename: {file.filename}")
     logger.info(f"Content type: {file.content_type}")
@@ -331,20 +862,25 @@ async def upload_video(file: UploadFile = File(...)):
             detail=f"Unsupported file type. Supported formats: {list(SUPPORTED_FORMATS.keys())}"
         )
     
+    # Generate unique session ID up front so the upload itself can be traced
+    session_id = str(uuid.uuid4())
+    tracing.start(session_id, requested=trace)
+
     # Validate file size (limit to 100MB)
-    content = await file.read()
+    with tracing.span(session_id, "upload", "upload.read"):
+        content = await file.read()
     file_size = len(content)
     logger.info(f"File size: {file_size} bytes ({file_size/(1024*1024):.2f} MB)")
     
     if file_size > 100 * 1024 * 1024:  # 100MB limit
         logger.error(f"File too large: {file_size} bytes")
+        tracing.finish(session_id, "upload")
         raise HTTPException(
             status_code=400,
             detail="File too large. Maximum size is 100MB."
         )
     
-    # Generate unique session ID and filename
-    session_id = str(uuid.uuid4())
+    # Generate filename
     file_extension = SUPPORTED_FORMATS.get(file.content_type, '.mp4')
     filename = f"video_{session_id}{file_extension}"
     file_path = os.path.join(TEMP_DIR, filename)
@@ -354,8 +890,9 @@ async def upload_video(file: UploadFile = File(...)):
     
     try:
         # Save uploaded file
-        with open(file_path, "wb") as buffer:
-            buffer.write(content)
+        with tracing.span(session_id, "upload", "upload.write", bytes=file_size):
+            with open(file_path, "wb") as buffer:
+                buffer.write(content)
         
         # Verify file was saved
         if not os.path.exists(file_path):
@@ -366,8 +903,18 @@ async def upload_video(file: UploadFile = File(...)):
         
         if saved_size != file_size:
             logger.warning(f"File size mismatch! Expected: {file_size}, Got: {saved_size}")
+
+        # Record the content hash once so connecting sessions need not rehash
+        with tracing.span(session_id, "upload", "upload.hash"):
+            content_hash = await asyncio.to_thread(lambda: hashlib.sha256(content).hexdigest())
+        write_session_hash(session_id, content_hash)
+
+        # Start the seek-friendly proxy now so it is likely ready by playback
+        if ENABLE_PROXY:
+            proxies.start(content_hash, file_path)
         
         logger.info(f"=== VIDEO UPLOAD COMPLETED ===")
+        tracing.finish(session_id, "upload")
         
         return {
             "session_id": session_id,
@@ -381,25 +928,238 @@ async def upload_video(file: UploadFile = File(...)):
         # Clean up on error
         if os.path.exists(file_path):
             os.remove(file_path)
+        tracing.finish(session_id, "upload")
         raise HTTPException(
             status_code=500, 
             detail=f"Failed to save video: {str(e)}"
         )
 
+class CreateUploadRequest(BaseModel):
+    filename: str
+    content_type: str
+    size: int
+    sha256: str
+
+@app.post("/uploads")
+async def create_upload(body: CreateUploadRequest, trace: bool = False):
+    """Start a resumable upload; the returned upload ID is also the session ID.
+
+    Pass ``?trace=true`` to trace the upload's parts and commit; the trace
+    is written when the upload is committed or aborted.
+    """
+    if body.content_type not in SUPPORTED_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unsupported file type. Supported formats: {list(SUPPORTED_FORMATS.keys())}"
+        )
+    if body.size <= 0 or body.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=400, detail="File too large. Maximum size is 100MB.")
+    if len(body.sha256) != 64:
+        raise HTTPException(status_code=400, detail="sha256 must be a hex SHA-256 digest")
+
+    session_id = str(uuid.uuid4())
+    file_path = os.path.join(TEMP_DIR, f"video_{session_id}{SUPPORTED_FORMATS[body.content_type]}")
+    # Decided once here and kept in the upload's state, so every worker agrees
+    traced = tracing.start(upload_trace_key(session_id), requested=trace)
+    try:
+        with tracing.span(upload_trace_key(session_id), "upload", "upload.create", bytes=body.size):
+            upload = await asyncio.to_thread(
+                uploads.create, session_id, file_path, body.size, body.content_type, body.sha256, body.filename,
+                traced
+            )
+    except TooManyUploads as e:
+        tracing.finish(upload_trace_key(session_id))
+        raise HTTPException(status_code=429, detail=str(e))
+    except Exception as e:
+        logger.error(f"Failed to create upload: {e}")
+        tracing.finish(upload_trace_key(session_id))
+        raise HTTPException(status_code=500, detail=f"Failed to create upload: {str(e)}")
+    if traced:
+        traced_uploads.add(session_id)
+
+    return {
+        **upload.status(),
+        "session_id": session_id,
+        "message": "Upload created. PUT parts to /uploads/{upload_id}/parts?offset=N, then commit."
+    }
+
+def finish_upload_trace(upload_id: str):
+    """Write the spans this worker recorded for a committed or aborted upload"""
+    traced_uploads.discard(upload_id)
+    tracing.finish(upload_trace_key(upload_id))
+
+@app.put("/uploads/{upload_id}/parts")
+async def upload_part(upload_id: str, offset: int, request: Request):
+    """Write one part at a byte offset; parts may be sent in parallel and retried"""
+    upload = await asyncio.to_thread(uploads.in_progress, upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail=f"No open upload {upload_id}")
+    if offset < 0 or offset >= upload.size:
+        raise HTTPException(status_code=400, detail="Offset outside the declared upload size")
+    if upload.traced:
+        tracing.start(upload_trace_key(upload_id), requested=True)
+        traced_uploads.add(upload_id)
+
+    try:
+        with tracing.span(upload_trace_key(upload_id), "upload", "upload.part", offset=offset):
+            written, upload = await uploads.write_part(upload, offset, request.stream())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except UploadGone as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except UploadBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error writing part for {upload_id} at {offset}: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to write part: {str(e)}")
+
+    return {"offset": offset, "written": written, **upload.status()}
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """Upload progress, including the byte ranges still missing (for resuming)"""
+    upload = await asyncio.to_thread(uploads.get, upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail=f"No upload {upload_id}")
+    return upload.status()
+
+@app.post("/uploads/{upload_id}/commit")
+async def commit_upload(upload_id: str):
+    """Verify all bytes and the checksum, then finalize the upload"""
+    upload = await asyncio.to_thread(uploads.in_progress, upload_id)
+    if upload is not None and upload.traced:
+        tracing.start(upload_trace_key(upload_id), requested=True)
+    try:
+        with tracing.span(upload_trace_key(upload_id), "upload", "upload.commit"):
+            upload = await uploads.commit(upload_id)
+    except ValueError as e:
+        # Still open, so parts can be resent and the commit retried
+        raise HTTPException(status_code=400, detail=str(e))
+    except UploadGone:
+        finish_upload_trace(upload_id)
+        raise HTTPException(status_code=404, detail=f"No open upload {upload_id}")
+    except UploadBusy as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    finish_upload_trace(upload_id)
+
+    # The checksum is verified now, so the upload may share decoders and proxies
+    await asyncio.to_thread(write_session_hash, upload_id, upload.sha256)
+    await manager.adopt_verified_hash(upload_id)
+    if ENABLE_PROXY:
+        proxies.start(upload.sha256, upload.path)
+
+    return {
+        "session_id": upload_id,
+        "filename": upload.filename,
+        "file_size_mb": round(upload.size / (1024 * 1024), 2),
+        "message": "Video uploaded successfully. Connect to WebSocket for real-time processing."
+    }
+
+@app.delete("/uploads/{upload_id}")
+async def abort_upload(upload_id: str):
+    """Abandon an upload and delete its partial file"""
+    upload = await asyncio.to_thread(uploads.in_progress, upload_id)
+    if upload is None:
+        raise HTTPException(status_code=404, detail=f"No open upload {upload_id}")
+    if upload.traced:
+        tracing.start(upload_trace_key(upload_id), requested=True)
+    with tracing.span(upload_trace_key(upload_id), "upload", "upload.abort"):
+        await uploads.abort(upload_id)
+    finish_upload_trace(upload_id)
+    return {"message": f"Upload {upload_id} aborted"}
+
+@app.post("/sessions/{session_id}/triage")
+async def triage_session_video(session_id: str):
+    """Fast keyframe-only screening of an uploaded video, densified around hits"""
+    if not classifier_ready.is_set():
+        raise HTTPException(status_code=503, detail="Model is still loading")
+    if not classifier:
+        raise HTTPException(status_code=503, detail="Classifier not available")
+
+    video_path = find_session_video(session_id)
+    if video_path is None:
+        raise HTTPException(status_code=404, detail=f"Video file not found for session {session_id}")
+    # Mid-upload the file is partly unwritten, so triage would miss content
+    if await asyncio.to_thread(uploads.in_progress, session_id) is not None:
+        raise HTTPException(status_code=409, detail=f"Upload for session {session_id} is not committed yet")
+
+    # Every triage inference takes a background admission slot, so a long
+    # triage cannot crowd live playheads out of the model
+    loop = asyncio.get_running_loop()
+
+    def classify_admitted(rgb_frame):
+        slot = asyncio.run_coroutine_threadsafe(
+            manager.admission.acquire(session_id, background=True), loop
+        ).result()
+        try:
+            return classifier.classify(rgb_frame, session_id)
+        finally:
+            loop.call_soon_threadsafe(slot.release)
+
+    try:
+        result = await asyncio.to_thread(triage_video, video_path, classify_admitted)
+    except Exception as e:
+        logger.error(f"Triage failed for {session_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Triage failed: {str(e)}")
+
+    return {"session_id": session_id, **result}
+
+@app.get("/sessions/{session_id}/timeline")
+async def get_session_timeline(session_id: str, request: Request, format: str = "json"):
+    """Merged classification intervals so far, as JSON or a WebVTT track.
+
+    Supports conditional GET: the ETag changes whenever new results arrive,
+    so polling players get a 304 until there is something new. Sessions
+    served by another worker are answered from their on-disk snapshot.
+    """
+    if format not in ("json", "vtt"):
+        raise HTTPException(status_code=400, detail="format must be 'json' or 'vtt'")
+    timeline = manager.timelines.get(session_id)
+    if timeline is not None:
+        snapshot = timeline.snapshot()
+        content_hash = manager.content_hashes[session_id]
+        duration = manager.video_info[session_id]["duration"]
+    else:
+        snapshot = await asyncio.to_thread(read_timeline_snapshot, session_id)
+        if snapshot is None:
+            raise HTTPException(status_code=404, detail=f"No active session {session_id}")
+        content_hash = snapshot["content_hash"]
+        duration = snapshot["duration"]
+
+    version = snapshot["version"]
+    etag = timeline_etag(content_hash, version, format)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+        return Response(status_code=304, headers=headers)
+
+    intervals = merge_intervals(snapshot["entries"], PROCESSING_INTERVAL)
+    if format == "vtt":
+        return Response(content=to_webvtt(intervals), media_type="text/vtt", headers=headers)
+    return JSONResponse(content={
+        "session_id": session_id,
+        "version": version,
+        "duration": duration,
+        "intervals": intervals
+    }, headers=headers)
+
 @app.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: str):
-    """WebSocket endpoint for real-time video processing with enhanced flow"""
+async def websocket_endpoint(websocket: WebSocket, session_id: str, clip_analysis: bool = False, trace: bool = False):
+    """WebSocket endpoint for real-time video processing with enhanced flow.
+
+    Pass ``?clip_analysis=true`` to also run the temporal clip model and
+    ``?trace=true`` to record a trace of this session.
+    """
     logger.info(f"=== WEBSOCKET CONNECTION STARTED for {session_id} ===")
+    tracing.start(session_id, requested=trace)
     
     await manager.connect(websocket, session_id)
     
     try:
         # Find video file
-        video_files = [f for f in os.listdir(TEMP_DIR) if f.startswith(f"video_{session_id}")]
-        logger.info(f"Looking for video files with pattern: video_{session_id}*")
-        logger.info(f"Found files: {video_files}")
+        video_path = find_session_video(session_id)
         
-        if not video_files:
+        if video_path is None:
             error_msg = f"Video file not found for session {session_id}. Please upload a video first."
             logger.error(error_msg)
             await manager.send_message(session_id, {
@@ -408,12 +1168,30 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             })
             return
         
-        video_path = os.path.join(TEMP_DIR, video_files[0])
         logger.info(f"Using video file: {video_path}")
+
+        # A chunked upload may still be arriving: wait for enough leading bytes
+        upload = await asyncio.to_thread(uploads.in_progress, session_id)
+        if upload is not None:
+            logger.info(f"Upload for {session_id} still in progress, waiting for first {UPLOAD_START_BYTES} bytes")
+            if not await uploads.wait_for_bytes(session_id, UPLOAD_START_BYTES, timeout=60.0):
+                await manager.send_message(session_id, {
+                    "type": "error",
+                    "message": "Upload has not delivered enough data to start playback"
+                })
+                return
+            # The declared checksum is unverified until commit, so this
+            # session gets a decoder of its own rather than sharing one
+            content_hash = f"upload:{session_id}"
+        else:
+            with tracing.span(session_id, "session", "content_hash"):
+                content_hash = await asyncio.to_thread(session_content_hash, session_id, video_path)
         
         # Initialize video capture
         logger.info(f"Initializing video capture...")
-        if not manager.initialize_video(session_id, video_path):
+        with tracing.span(session_id, "session", "initialize_video"):
+            initialized = manager.initialize_video(session_id, video_path, content_hash)
+        if not initialized:
             error_msg = f"Failed to initialize video processing for {session_id}"
             logger.error(error_msg)
             await manager.send_message(session_id, {
@@ -421,6 +1199,7 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                 "message": error_msg
             })
             return
+        await manager.attach_proxy(session_id)
 
         # Send video info
         video_info = manager.video_info[session_id]
@@ -436,6 +1215,12 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
             manager.start_continuous_processing(session_id)
         )
         manager.processing_tasks[session_id] = processing_task
+        manager.snapshot_tasks[session_id] = asyncio.create_task(manager.snapshot_timeline(session_id))
+
+        if clip_analysis:
+            manager.clip_tasks[session_id] = asyncio.create_task(
+                manager.start_clip_analysis(session_id)
+            )
         
         # Listen for messages from client
         while True:
@@ -446,8 +1231,9 @@ async def websocket_endpoint(websocket: WebSocket, session_id: str):
                 
                 if data.get("type") == "process_frame":
                     timestamp = data.get("timestamp", 0)
-                    # Process specific frame (in addition to continuous processing)
-                    await manager.process_frame_at_timestamp(session_id, timestamp)
+                    # Process specific frame (in addition to continuous processing);
+                    # only the newest pending playhead per session is kept
+                    await manager.submit_playhead(session_id, timestamp, data.get("request_id"))
                 elif data.get("type") == "connect":
                     logger.info(f"Connection acknowledged for {session_id}")
                 else:
@@ -0,0 +1,233 @@
+import asyncio
+import fcntl
+import logging
+import os
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from triage import fps_passthrough_args
+
+logger = logging.getLogger(__name__)
+
+
+class ProxyManager:
+    """Background transcodes of uploads into seek-friendly, model-resolution proxies.
+
+    A proxy keeps every frame of the source (so frame numbers and timestamps
+    line up) but is scaled so its short side is ``size`` pixels and encoded
+    with a GOP of ``gop`` frames (1 = all-intra), making any seek cheap.
+    Proxies are keyed by content hash, so identical uploads share one.
+
+    At most ``max_concurrent`` transcodes run per process. The finished
+    proxy on disk is the shared state between worker processes: an
+    ``O_EXCL`` lock file makes sure only one of them transcodes a given
+    hash, and the others wait for its result. Sessions reading a proxy hold
+    a lease file next to it, and the proxy is deleted only once no session
+    on any worker holds one.
+    """
+
+    def __init__(self, temp_dir: str, size: int = 224, gop: int = 1, max_concurrent: int = 1):
+        self.temp_dir = temp_dir
+        self.size = size
+        self.gop = max(1, gop)
+        self.tasks: Dict[str, asyncio.Task] = {}
+        self.listeners: List[Callable[[str, str], None]] = []
+        self.semaphore = asyncio.Semaphore(max(1, max_concurrent))
+
+    def proxy_path(self, content_hash: str) -> str:
+        return os.path.join(self.temp_dir, f"proxy_{content_hash}.mp4")
+
+    def _lock_path(self, content_hash: str) -> str:
+        return self.proxy_path(content_hash) + ".lock"
+
+    def _lease_path(self, content_hash: str, session_id: str) -> str:
+        return f"{self.proxy_path(content_hash)}.{session_id}.lease"
+
+    @contextmanager
+    def _leases_locked(self):
+        """Serialize lease changes (and proxy deletion) across worker processes"""
+        with open(os.path.join(self.temp_dir, "proxy_leases.lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def _live_leases(self, content_hash: str) -> List[str]:
+        """Lease files for a hash, removing those left by dead workers"""
+        prefix = os.path.basename(self.proxy_path(content_hash)) + "."
+        live = []
+        for name in os.listdir(self.temp_dir):
+            if not (name.startswith(prefix) and name.endswith(".lease")):
+                continue
+            path = os.path.join(self.temp_dir, name)
+            if _lock_owner_alive(path):
+                live.append(path)
+            else:
+                logger.warning(f"Removing stale proxy lease {path}")
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+        return live
+
+    def acquire(self, content_hash: str, session_id: str):
+        """Record that a session reads (or will read) this content's proxy; blocking"""
+        with self._leases_locked():
+            with open(self._lease_path(content_hash, session_id), "w") as f:
+                f.write(str(os.getpid()))
+
+    def release(self, content_hash: str, session_id: str) -> bool:
+        """Drop a session's lease, deleting the proxy if it was the last; blocking.
+
+        Returns whether the proxy was deleted, i.e. no session anywhere needs it.
+        """
+        with self._leases_locked():
+            try:
+                os.remove(self._lease_path(content_hash, session_id))
+            except FileNotFoundError:
+                pass
+            if self._live_leases(content_hash):
+                return False
+            path = self.get(content_hash)
+            if path:
+                try:
+                    os.remove(path)
+                    logger.info(f"Deleted proxy file: {path}")
+                except Exception as e:
+                    logger.error(f"Error deleting proxy file {path}: {e}")
+            return True
+
+    def get(self, content_hash: str) -> Optional[str]:
+        """Path of a finished proxy (made by any worker process), or None"""
+        path = self.proxy_path(content_hash)
+        return path if os.path.exists(path) else None
+
+    def add_listener(self, callback: Callable[[str, str], None]):
+        """Call ``callback(content_hash, proxy_path)`` whenever a proxy is ready"""
+        self.listeners.append(callback)
+
+    def start(self, content_hash: str, source_path: str):
+        """Schedule a transcode unless one exists or is already running"""
+        if self.get(content_hash) is not None:
+            return
+        task = self.tasks.get(content_hash)
+        if task is not None and not task.done():
+            return
+        self.tasks[content_hash] = asyncio.create_task(self._run(content_hash, source_path))
+
+    def _claim(self, content_hash: str) -> bool:
+        """Take the cross-process transcode lock for a hash"""
+        lock_path = self._lock_path(content_hash)
+        for _ in range(2):
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if _lock_owner_alive(lock_path):
+                    return False
+                # Left behind by a worker that died mid-transcode
+                logger.warning(f"Removing stale proxy lock {lock_path}")
+                try:
+                    os.remove(lock_path)
+                except FileNotFoundError:
+                    pass
+                continue
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            return True
+        return False
+
+    async def _run(self, content_hash: str, source_path: str):
+        if self._claim(content_hash):
+            try:
+                async with self.semaphore:
+                    ok = await self._transcode(content_hash, source_path)
+            finally:
+                try:
+                    os.remove(self._lock_path(content_hash))
+                except FileNotFoundError:
+                    pass
+        else:
+            logger.info(f"Proxy for {content_hash[:12]} is being made by another worker, waiting")
+            while os.path.exists(self._lock_path(content_hash)) and _lock_owner_alive(self._lock_path(content_hash)):
+                await asyncio.sleep(1.0)
+            ok = self.get(content_hash) is not None
+
+        if ok:
+            output_path = self.proxy_path(content_hash)
+            for callback in self.listeners:
+                try:
+                    callback(content_hash, output_path)
+                except Exception as e:
+                    logger.error(f"Proxy listener failed for {content_hash[:12]}: {e}")
+
+    async def _transcode(self, content_hash: str, source_path: str) -> bool:
+        output_path = self.proxy_path(content_hash)
+        # Private to this process, so nothing else can write into it
+        partial_path = f"{output_path}.{os.getpid()}.part"
+        size = self.size
+        cmd = [
+            'ffmpeg', '-v', 'error',
+            '-i', source_path,
+            '-map', '0:v:0', '-an',
+            # Short side to model resolution, aspect preserved
+            '-vf', f"scale='if(gt(iw,ih),-2,{size})':'if(gt(iw,ih),{size},-2)'",
+            # Keep every frame so numbering matches
+            *await asyncio.to_thread(fps_passthrough_args),
+            '-c:v', 'libx264',
+            '-preset', 'ultrafast',
+            '-crf', '23',
+            '-g', str(self.gop),
+            '-f', 'mp4',
+            '-y', partial_path
+        ]
+        logger.info(f"Starting proxy transcode for {content_hash[:12]} (GOP {self.gop}, {size}px)")
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE
+            )
+        except FileNotFoundError:
+            logger.warning("ffmpeg not found, skipping proxy generation")
+            return False
+
+        try:
+            _, stderr = await proc.communicate()
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+
+        if proc.returncode != 0:
+            logger.error(f"Proxy transcode failed for {content_hash[:12]}: {stderr.decode(errors='replace')}")
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            return False
+
+        # Atomic rename so readers never see a half-written proxy
+        os.replace(partial_path, output_path)
+        logger.info(f"Proxy ready for {content_hash[:12]}: {output_path}")
+        return True
+
+    def cancel(self, content_hash: str):
+        """Stop any transcode this process is running for a hash nobody needs any more"""
+        task = self.tasks.pop(content_hash, None)
+        if task is not None and not task.done():
+            task.cancel()
+
+
+def _lock_owner_alive(lock_path: str) -> bool:
+    """Whether the process that wrote a lock file is still running"""
+    try:
+        with open(lock_path) as f:
+            pid = int(f.read().strip())
+    except FileNotFoundError:
+        return False
+    except ValueError:
+        # Just created, pid not written yet
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
@@ -0,0 +1,120 @@
+"""Re-score stored frames with a (new) image model, without touching the videos.
+
+Reads the per-content-hash frame arrays written to FRAME_STORE_DIR by main.py
+and classify.py, memory-maps them and streams fixed-size batches straight
+into the pipeline. Hashes are spread over worker processes, each pinned to
+its own slice of the cores with the model loaded once per worker.
+
+    FRAME_STORE_DIR=frame_store python rescore.py --model org/new-model --workers 4
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+from PIL import Image
+
+from frame_store import FRAME_STORE_DIR, FrameStore
+from inference import MODEL_CACHE_DIR, MODEL_NAME, load_pipeline, warm_up
+from inference_server import parse_cores, pin_to_cores
+from serve import split_cores
+from timeline import merge_intervals
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Set in each worker process by _init_worker
+_pipe = None
+_args = None
+
+
+def _init_worker(core_groups, args):
+    global _pipe, _args
+    _args = args
+    pin_to_cores(core_groups.get())
+    _pipe = load_pipeline(args.model, args.cache_dir)
+    warm_up(_pipe, [args.batch_size])
+
+
+def rescore_hash(content_hash: str) -> dict:
+    """Classify every stored frame for one hash and write its timeline"""
+    start = time.monotonic()
+    store = FrameStore(_args.store_dir)
+    entries = []
+    for timestamps, frames in store.iter_batches(content_hash, _args.batch_size):
+        images = [Image.fromarray(frame) for frame in frames]
+        for timestamp, result in zip(timestamps, _pipe(images, batch_size=_args.batch_size)):
+            top = result[0]
+            entries.append({
+                "start": float(timestamp),
+                "end": float(timestamp),
+                "source": "frame",
+                "label": top["label"],
+                "confidence": float(top["score"]),
+                "is_nsfw": top["label"].lower() != "normal",
+            })
+
+    path = os.path.join(_args.output_dir, f"{content_hash}.json")
+    with open(path, "w") as f:
+        json.dump({
+            "content_hash": content_hash,
+            "model": _args.model,
+            "frames": entries,
+            "intervals": merge_intervals(entries, _args.point_span),
+        }, f, indent=2)
+
+    elapsed = time.monotonic() - start
+    logger.info(f"Re-scored {content_hash[:12]}: {len(entries)} frames in {elapsed:.1f}s -> {path}")
+    return {"content_hash": content_hash, "frames": len(entries), "seconds": elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score stored frames with an image-classification model")
+    parser.add_argument("--store-dir", default=FRAME_STORE_DIR or "frame_store")
+    parser.add_argument("--model", default=MODEL_NAME)
+    parser.add_argument("--cache-dir", default=MODEL_CACHE_DIR)
+    parser.add_argument("--output-dir", default="rescored")
+    parser.add_argument("--workers", type=int, default=1, help="Inference processes")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--cores", default=None, help="Cores to spread workers over, e.g. '0-15'")
+    parser.add_argument("--point-span", type=float, default=0.5,
+                        help="Seconds each sampled frame is taken to cover when merging intervals")
+    parser.add_argument("hashes", nargs="*", help="Content hashes to re-score (default: all stored)")
+    args = parser.parse_args()
+
+    hashes = args.hashes or FrameStore(args.store_dir).hashes()
+    if not hashes:
+        logger.warning(f"No stored frames found in {args.store_dir}")
+        return
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    if args.cores:
+        cores = parse_cores(args.cores)
+    elif hasattr(os, "sched_getaffinity"):
+        cores = os.sched_getaffinity(0)
+    else:
+        cores = set(range(os.cpu_count() or 1))
+    workers = max(1, min(args.workers, len(hashes)))
+
+    # Spawn so workers never inherit a half-initialized torch from the parent
+    ctx = multiprocessing.get_context("spawn")
+    core_groups = ctx.Manager().Queue()
+    for group in split_cores(cores, workers):
+        core_groups.put(set(group))
+
+    start = time.monotonic()
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(core_groups, args)) as pool:
+        results = pool.map(rescore_hash, hashes, chunksize=1)
+    elapsed = time.monotonic() - start
+
+    total_frames = sum(r["frames"] for r in results)
+    logger.info(
+        f"Re-scored {len(results)} videos, {total_frames} frames in {elapsed:.1f}s "
+        f"({total_frames / elapsed if elapsed > 0 else 0:.1f} frames/s) with {workers} workers"
+    )
+
+
+if __name__ == "__main__":
+    main()
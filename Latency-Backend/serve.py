@@ -0,0 +1,103 @@
+"""Launch the API as N HTTP/WebSocket workers in front of shared inference servers.
+
+Each inference server loads the model once and is pinned to its own slice of
+the available cores; uvicorn workers stay lightweight and forward frames to
+them over Unix sockets with pixels passed through shared memory.
+
+A session's state (decoder, playhead queue, background sweep) lives on the
+worker that accepted its WebSocket, so it stays there for the connection's
+lifetime; uploads land in the shared temp directory, so any worker can pick a
+session up. Within a worker, each session is routed to the same inference
+server by hashing its ID.
+
+    python serve.py --workers 4 --inference-servers 2
+"""
+import argparse
+import logging
+import os
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import uvicorn
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def split_cores(cores, parts: int):
+    """Divide a set of cores into ``parts`` contiguous, near-equal groups"""
+    cores = sorted(cores)
+    size, extra = divmod(len(cores), parts)
+    groups, start = [], 0
+    for i in range(parts):
+        end = start + size + (1 if i < extra else 0)
+        groups.append(cores[start:end] or cores)
+        start = end
+    return groups
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Multi-worker NSFW detector deployment")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=4, help="HTTP/WebSocket worker processes")
+    parser.add_argument("--inference-servers", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--socket-dir", default=None,
+                        help="Directory for the inference sockets (default: a new private temp dir)")
+    args = parser.parse_args()
+
+    # Only this deployment's processes know the key, and the sockets live in
+    # a directory other local users cannot enter
+    os.environ["INFERENCE_AUTHKEY"] = secrets.token_hex(32)
+    socket_dir = args.socket_dir or tempfile.mkdtemp(prefix="palanam-infer-")
+
+    available = os.sched_getaffinity(0) if hasattr(os, "sched_getaffinity") else set(range(os.cpu_count() or 1))
+    core_groups = split_cores(available, args.inference_servers)
+
+    sockets, servers = [], []
+    for i, cores in enumerate(core_groups):
+        socket_path = os.path.join(socket_dir, f"palanam-infer-{os.getpid()}-{i}.sock")
+        cmd = [
+            sys.executable, os.path.join(BACKEND_DIR, "inference_server.py"),
+            "--socket", socket_path,
+            "--cores", ",".join(str(c) for c in cores),
+            "--batch-size", str(args.batch_size),
+        ]
+        logger.info(f"Starting inference server {i} on cores {cores}")
+        servers.append(subprocess.Popen(cmd, cwd=BACKEND_DIR))
+        sockets.append(socket_path)
+
+    def shutdown():
+        for server in servers:
+            server.terminate()
+        for socket_path in sockets:
+            if os.path.exists(socket_path):
+                os.remove(socket_path)
+        if args.socket_dir is None:
+            shutil.rmtree(socket_dir, ignore_errors=True)
+
+    # Workers connect lazily, but wait for the sockets so early requests don't fail
+    while not all(os.path.exists(p) for p in sockets):
+        if any(s.poll() is not None for s in servers):
+            logger.error("An inference server exited during startup")
+            shutdown()
+            sys.exit(1)
+        time.sleep(0.5)
+
+    os.environ["INFERENCE_SOCKETS"] = ",".join(sockets)
+    try:
+        uvicorn.run("main:app", app_dir=BACKEND_DIR, host=args.host, port=args.port,
+                    workers=args.workers, log_level="info")
+    finally:
+        shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from admission import AdmissionController
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_acquire_times_out_when_full():
+    async def scenario():
+        admission = AdmissionController(global_limit=1, session_limit=1)
+        slot = await admission.acquire("a")
+        assert slot is not None
+        assert await admission.acquire("b", timeout=0.05) is None
+        assert admission.rejected == 1
+        slot.release()
+        await asyncio.sleep(0)
+        assert await admission.acquire("b", timeout=0.05) is not None
+
+    run(scenario())
+
+
+def test_background_limit_leaves_headroom_for_playheads():
+    async def scenario():
+        admission = AdmissionController(global_limit=2, session_limit=2, background_limit=1)
+        assert await admission.acquire("a", background=True) is not None
+        assert await admission.acquire("b", timeout=0.05, background=True) is None
+        assert await admission.acquire("b", timeout=0.05) is not None
+
+    run(scenario())
+
+
+def test_release_survives_cancellation():
+    async def scenario():
+        admission = AdmissionController(global_limit=1, session_limit=1)
+        started = asyncio.Event()
+
+        async def worker():
+            slot = await admission.acquire("a")
+            try:
+                started.set()
+                await asyncio.sleep(10)
+            finally:
+                slot.release()
+
+        task = asyncio.create_task(worker())
+        await started.wait()
+        # Someone is queued on the condition when the worker is cancelled
+        waiter = asyncio.create_task(admission.acquire("b", timeout=1.0))
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        slot = await waiter
+        assert slot is not None
+        slot.release()
+        await asyncio.sleep(0)
+        assert admission.inflight == 0
+        assert admission.session_inflight == {}
+
+    run(scenario())
+
+
+def test_slot_held_until_executor_work_finishes():
+    async def scenario():
+        admission = AdmissionController(global_limit=1, session_limit=1)
+        gate = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=1)
+
+        async def worker():
+            slot = await admission.acquire("a")
+            try:
+                future = executor.submit(gate.wait)
+                slot.hold_until(future)
+                await asyncio.wrap_future(future)
+            finally:
+                slot.release()
+
+        task = asyncio.create_task(worker())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+        # The thread is still running, so its slot must still be taken
+        assert admission.inflight == 1
+        assert await admission.acquire("b", timeout=0.05) is None
+
+        gate.set()
+        slot = await admission.acquire("b", timeout=1.0)
+        assert slot is not None
+        assert admission.inflight == 1
+        executor.shutdown()
+
+    run(scenario())
+
+
+def test_sampling_interval_widens_with_pressure():
+    async def scenario():
+        admission = AdmissionController(global_limit=2, session_limit=2, max_interval_factor=4.0)
+        assert admission.sampling_interval(0.5) == 0.5
+        await admission.acquire("a")
+        await admission.acquire("b")
+        assert admission.sampling_interval(0.5) == 1.0
+
+    run(scenario())
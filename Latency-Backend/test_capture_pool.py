@@ -0,0 +1,73 @@
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from capture_pool import CapturePool
+
+
+def _video(path, shade):
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 10, (32, 32))
+    for i in range(20):
+        writer.write(np.full((32, 32, 3), shade(i), dtype=np.uint8))
+    writer.release()
+    return str(path)
+
+
+def test_open_racing_an_eviction_still_respects_the_limit(tmp_path):
+    pool = CapturePool(max_open=1)
+    pool.register("a", _video(tmp_path / "a.avi", lambda i: 10 * i), "hash-a")
+    pool.register("b", _video(tmp_path / "b.avi", lambda i: 10 * i), "hash-b")
+    entry_a, entry_b = pool._entries["hash-a"], pool._entries["hash-b"]
+
+    opening, proceed = threading.Event(), threading.Event()
+    open_a = entry_a.open
+
+    def slow_open():
+        opening.set()
+        proceed.wait(5)
+        return open_a()
+
+    entry_a.open = slow_open
+    reader = threading.Thread(target=pool.read_frame, args=("a", 0))
+    reader.start()
+    assert opening.wait(5)
+    # b opens while a is checked out but not yet open
+    assert pool.read_frame("b", 0)[0]
+    proceed.set()
+    reader.join(5)
+
+    assert pool.stats()["open"] == 1
+    assert entry_a.is_open
+    assert not entry_b.is_open
+
+
+def test_set_source_and_unregister_do_not_wait_for_a_reader(tmp_path):
+    pool = CapturePool()
+    pool.register("s", _video(tmp_path / "dark.avi", lambda i: 10), "h")
+    proxy = _video(tmp_path / "light.avi", lambda i: 240)
+    assert pool.read_frame("s", 0)[0]
+    entry = pool._entries["h"]
+
+    # A decoding thread holds the capture
+    entry.lock.acquire()
+    caller = threading.Thread(target=pool.set_source, args=("h", proxy))
+    caller.start()
+    caller.join(1)
+    assert not caller.is_alive()
+    entry.lock.release()
+
+    ret, frame = pool.read_frame("s", 5)
+    assert ret and frame.mean() > 200
+    assert pool.stats()["open"] == 1
+
+    entry.lock.acquire()
+    caller = threading.Thread(target=pool.unregister, args=("s",))
+    caller.start()
+    caller.join(1)
+    assert not caller.is_alive()
+    assert entry.close_pending
+    entry.lock.release()
+    assert pool.stats()["open"] == 0
@@ -0,0 +1,67 @@
+import os
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from frame_store import _RECORDS_FILE, FrameStore, record_dtype
+
+SIZE = 8
+HASH = "a" * 64
+
+
+def frame(value: int):
+    return np.full((SIZE, SIZE, 3), value, dtype=np.uint8)
+
+
+def test_records_stay_aligned(tmp_path):
+    store = FrameStore(str(tmp_path), SIZE)
+    for i in range(3):
+        assert store.add(HASH, float(i), frame(i))
+    assert not store.add(HASH, 1.0, frame(99))
+    store.release(HASH)
+
+    timestamps, frames = store.open(HASH)
+    assert list(timestamps) == [0.0, 1.0, 2.0]
+    assert [int(f[0, 0, 0]) for f in frames] == [0, 1, 2]
+
+
+def test_reopen_drops_partial_record(tmp_path):
+    store = FrameStore(str(tmp_path), SIZE)
+    store.add(HASH, 0.0, frame(10))
+    store.add(HASH, 1.0, frame(11))
+    store.release(HASH)
+    # A writer that died part-way through its next record
+    with open(os.path.join(str(tmp_path), HASH, _RECORDS_FILE), "ab") as f:
+        f.write(np.float64(2.0).tobytes() + b"\x07" * (SIZE * SIZE))
+
+    reopened = FrameStore(str(tmp_path), SIZE)
+    assert not reopened.add(HASH, 1.0, frame(99))
+    assert reopened.add(HASH, 3.0, frame(13))
+    reopened.release(HASH)
+
+    path = os.path.join(str(tmp_path), HASH, _RECORDS_FILE)
+    assert os.path.getsize(path) == 3 * record_dtype(SIZE).itemsize
+    timestamps, frames = reopened.open(HASH)
+    assert list(timestamps) == [0.0, 1.0, 3.0]
+    assert [int(f[0, 0, 0]) for f in frames] == [10, 11, 13]
+
+
+def test_writers_share_one_store(tmp_path):
+    # Two stores stand in for two worker processes writing the same hash
+    first = FrameStore(str(tmp_path), SIZE)
+    second = FrameStore(str(tmp_path), SIZE)
+    assert first.add(HASH, 0.0, frame(1))
+    assert second.add(HASH, 0.5, frame(2))
+    assert not second.add(HASH, 0.0, frame(3))
+    assert not first.add(HASH, 0.5, frame(4))
+    assert first.add(HASH, 1.0, frame(5))
+    first.release(HASH)
+    second.release(HASH)
+
+    batches = list(first.iter_batches(HASH, batch_size=2))
+    timestamps = [float(t) for ts, _ in batches for t in ts]
+    pixels = [int(f[0, 0, 0]) for _, fs in batches for f in fs]
+    assert timestamps == [0.0, 0.5, 1.0]
+    assert pixels == [1, 2, 5]
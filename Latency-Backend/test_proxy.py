@@ -0,0 +1,32 @@
+import os
+
+from proxy import ProxyManager
+
+
+def _proxy(manager, content_hash):
+    with open(manager.proxy_path(content_hash), "wb") as f:
+        f.write(b"proxy")
+
+
+def test_proxy_kept_while_any_worker_holds_a_lease(tmp_path):
+    worker_a, worker_b = ProxyManager(str(tmp_path)), ProxyManager(str(tmp_path))
+    _proxy(worker_a, "h")
+    worker_a.acquire("h", "s1")
+    worker_b.acquire("h", "s2")
+
+    assert not worker_a.release("h", "s1")
+    assert worker_b.get("h") is not None
+    assert worker_b.release("h", "s2")
+    assert worker_a.get("h") is None
+
+
+def test_leases_of_dead_workers_are_ignored(tmp_path):
+    manager = ProxyManager(str(tmp_path))
+    _proxy(manager, "h")
+    manager.acquire("h", "s1")
+    with open(manager._lease_path("h", "crashed"), "w") as f:
+        f.write("999999999")
+
+    assert manager.release("h", "s1")
+    assert manager.get("h") is None
+    assert not os.path.exists(manager._lease_path("h", "crashed"))
@@ -0,0 +1,54 @@
+import json
+
+from timeline import SessionTimeline, merge_intervals, timeline_etag, to_webvtt
+
+
+def _frame(t, label, confidence=0.9):
+    return {"start": t, "end": t, "source": "frame", "label": label,
+            "confidence": confidence, "is_nsfw": label != "normal"}
+
+
+def test_points_merge_per_label_over_their_span():
+    entries = [_frame(0.0, "normal", 0.8), _frame(0.5, "normal", 0.95), _frame(1.0, "porn"),
+               _frame(1.5, "normal"), _frame(3.0, "normal")]
+    intervals = merge_intervals(entries, point_span=1.0)
+    # A differently-labelled point in between does not split a label's interval
+    assert [(i["label"], i["start"], i["end"]) for i in intervals] == [
+        ("normal", 0.0, 2.5), ("porn", 1.0, 2.0), ("normal", 3.0, 4.0)
+    ]
+    assert intervals[0]["confidence"] == 0.95
+    assert intervals[1]["is_nsfw"]
+    assert not intervals[2]["is_nsfw"]
+
+
+def test_clip_interval_absorbs_overlapping_points():
+    timeline = SessionTimeline()
+    timeline.add_frame(30, 1.0, "porn", 0.7, True)
+    timeline.add_clip(0.0, 4.0, "porn", 0.9, True)
+    timeline.add_frame(120, 4.0, "porn", 0.6, True)
+    timeline.add_frame(150, 5.0, "porn", 0.8, True)
+    intervals = timeline.intervals(0.5)
+    assert [(i["start"], i["end"]) for i in intervals] == [(0.0, 4.5), (5.0, 5.5)]
+    assert intervals[0]["sources"] == ["clip", "frame"]
+    assert intervals[0]["confidence"] == 0.9
+    assert timeline.version == 4
+
+
+def test_webvtt_cues():
+    intervals = merge_intervals([_frame(3661.2345, "porn", 0.88)], point_span=0.5)
+    vtt = to_webvtt(intervals)
+    lines = vtt.split("\n")
+    assert lines[:2] == ["WEBVTT", ""]
+    assert lines[2] == "1"
+    assert lines[3] == "01:01:01.234 --> 01:01:01.734"
+    assert json.loads(lines[4]) == {"label": "porn", "confidence": 0.88, "is_nsfw": True, "sources": ["frame"]}
+    assert to_webvtt([]) == "WEBVTT\n"
+
+
+def test_etag_tracks_hash_version_and_format():
+    etag = timeline_etag("a" * 64, 3, "json")
+    assert etag.startswith('"') and etag.endswith('"')
+    assert etag == timeline_etag("a" * 64, 3, "json")
+    assert etag != timeline_etag("a" * 64, 4, "json")
+    assert etag != timeline_etag("a" * 64, 3, "vtt")
+    assert etag != timeline_etag("b" * 64, 3, "json")
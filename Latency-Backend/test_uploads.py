@@ -0,0 +1,146 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+
+from uploads import ChunkedUpload, TooManyUploads, UploadBusy, UploadGone, UploadManager
+
+
+async def _stream(data, chunk=700_000):
+    for i in range(0, len(data), chunk):
+        yield data[i:i + chunk]
+
+
+def _new_upload(manager, tmp_path, upload_id, data):
+    return manager.create(upload_id, str(tmp_path / f"video_{upload_id}.mp4"), len(data), "video/mp4",
+                          hashlib.sha256(data).hexdigest(), "clip.mp4")
+
+
+def test_ranges_merge_and_report_gaps():
+    upload = ChunkedUpload("u", "/dev/null", 100, "video/mp4", "0" * 64, "f")
+    upload.add_range(50, 60)
+    upload.add_range(0, 20)
+    upload.add_range(20, 30)
+    assert upload.ranges == [(0, 30), (50, 60)]
+    assert upload.contiguous_bytes == 30
+    assert upload.received_bytes == 40
+    assert upload.missing_ranges() == [(30, 50), (60, 100)]
+
+
+def test_parts_from_another_worker_are_visible(tmp_path):
+    data = os.urandom(3_000_000)
+
+    async def scenario():
+        server = UploadManager(str(tmp_path))
+        other_worker = UploadManager(str(tmp_path))
+        upload = _new_upload(server, tmp_path, "a", data)
+
+        written, upload = await other_worker.write_part(upload, 1_000_000, _stream(data[1_000_000:]))
+        assert written == 2_000_000
+        assert server.available_fraction("a") == 0.0
+
+        waiter = asyncio.create_task(server.wait_for_bytes("a", 2_000_000, timeout=2.0))
+        await asyncio.sleep(0.05)
+        await other_worker.write_part(upload, 0, _stream(data[:1_000_000]))
+        assert await waiter
+
+        committed = await other_worker.commit("a")
+        assert committed.committed
+        assert server.in_progress("a") is None
+        assert open(upload.path, "rb").read() == data
+
+    asyncio.run(scenario())
+
+
+def test_commit_rejects_checksum_mismatch(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path))
+        upload = manager.create("a", str(tmp_path / "video_a.mp4"), 4, "video/mp4", "0" * 64, "f")
+        await manager.write_part(upload, 0, _stream(b"abcd"))
+        with pytest.raises(ValueError):
+            await manager.commit("a")
+        assert manager.in_progress("a") is not None
+
+    asyncio.run(scenario())
+
+
+async def _stalled(data, resume):
+    await resume.wait()
+    yield data
+
+
+def test_commit_waits_for_parts_in_flight(tmp_path):
+    data = b"abcdefgh"
+
+    async def scenario():
+        manager = UploadManager(str(tmp_path))
+        upload = _new_upload(manager, tmp_path, "a", data)
+        resume = asyncio.Event()
+        part = asyncio.create_task(manager.write_part(upload, 0, _stalled(data, resume)))
+        await asyncio.sleep(0.05)
+        with pytest.raises(UploadBusy):
+            await manager.commit("a")
+
+        resume.set()
+        await part
+        assert (await manager.commit("a")).committed
+
+    asyncio.run(scenario())
+
+
+def test_stalled_part_cannot_change_verified_file(tmp_path):
+    data = b"abcdefgh"
+
+    async def scenario():
+        manager = UploadManager(str(tmp_path), part_timeout=0.05)
+        upload = _new_upload(manager, tmp_path, "a", data)
+        resume = asyncio.Event()
+        stalled = asyncio.create_task(manager.write_part(upload, 0, _stalled(b"EVILAAAA", resume)))
+        await manager.write_part(upload, 0, _stream(data))
+        await asyncio.sleep(0.1)
+        await manager.commit("a")
+
+        resume.set()
+        with pytest.raises(UploadGone):
+            await stalled
+        assert open(upload.path, "rb").read() == data
+
+    asyncio.run(scenario())
+
+
+def test_wait_for_bytes_times_out(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path))
+        _new_upload(manager, tmp_path, "a", b"x" * 10)
+        assert not await manager.wait_for_bytes("a", 5, timeout=0.1)
+
+    asyncio.run(scenario())
+
+
+def test_open_upload_limit_and_abort(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path), max_open=1)
+        upload = _new_upload(manager, tmp_path, "a", b"x" * 10)
+        with pytest.raises(TooManyUploads):
+            _new_upload(manager, tmp_path, "b", b"y" * 10)
+
+        await manager.abort("a")
+        assert not os.path.exists(upload.path)
+        with pytest.raises(UploadGone):
+            await manager.write_part(upload, 0, _stream(b"x" * 10))
+        _new_upload(manager, tmp_path, "b", b"y" * 10)
+
+    asyncio.run(scenario())
+
+
+def test_sweep_expires_idle_uploads(tmp_path):
+    async def scenario():
+        manager = UploadManager(str(tmp_path), ttl=0.0)
+        upload = _new_upload(manager, tmp_path, "a", b"x" * 10)
+        await asyncio.sleep(0.01)
+        await manager.sweep()
+        assert manager.get("a") is None
+        assert not os.path.exists(upload.path)
+
+    asyncio.run(scenario())
@@ -0,0 +1,117 @@
+import hashlib
+import json
+import threading
+from typing import Dict, List
+
+
+class SessionTimeline:
+    """Classification results for one session, ordered by time.
+
+    Per-frame results are points (start == end); clip results from the
+    temporal model cover an interval. ``version`` increments on every change
+    so callers can cheaply tell whether anything new has arrived.
+    """
+
+    def __init__(self):
+        self.frames: Dict[int, dict] = {}
+        self.clips: Dict[float, dict] = {}
+        self.version = 0
+        self._lock = threading.Lock()
+
+    def add_frame(self, frame_number: int, timestamp: float, label: str, confidence: float, is_nsfw: bool):
+        with self._lock:
+            self.frames[frame_number] = {
+                "start": timestamp,
+                "end": timestamp,
+                "source": "frame",
+                "label": label,
+                "confidence": confidence,
+                "is_nsfw": is_nsfw,
+            }
+            self.version += 1
+
+    def add_clip(self, start: float, end: float, label: str, confidence: float, is_nsfw: bool):
+        with self._lock:
+            self.clips[start] = {
+                "start": start,
+                "end": end,
+                "source": "clip",
+                "label": label,
+                "confidence": confidence,
+                "is_nsfw": is_nsfw,
+            }
+            self.version += 1
+
+    def entries(self) -> List[dict]:
+        """All frame and clip results sorted by start time"""
+        return self.snapshot()["entries"]
+
+    def snapshot(self) -> dict:
+        """Entries together with the version they correspond to"""
+        with self._lock:
+            entries = list(self.frames.values()) + list(self.clips.values())
+            version = self.version
+        return {"version": version, "entries": sorted(entries, key=lambda e: (e["start"], e["end"]))}
+
+    def intervals(self, point_span: float) -> List[dict]:
+        return merge_intervals(self.entries(), point_span)
+
+
+def merge_intervals(entries: List[dict], point_span: float) -> List[dict]:
+    """Collapse results into contiguous same-label intervals.
+
+    A point result is taken to cover ``point_span`` seconds from its
+    timestamp (the sampling interval). Overlapping or touching entries with
+    the same label are merged; their confidence is the maximum seen.
+    """
+    spans = sorted(
+        (dict(e, end=max(e["end"], e["start"] + point_span)) for e in entries),
+        key=lambda e: (e["start"], e["end"])
+    )
+    merged: List[dict] = []
+    open_by_label: Dict[str, dict] = {}
+    for entry in spans:
+        current = open_by_label.get(entry["label"])
+        if current is not None and entry["start"] <= current["end"]:
+            current["end"] = max(current["end"], entry["end"])
+            current["confidence"] = max(current["confidence"], entry["confidence"])
+            if entry["source"] not in current["sources"]:
+                current["sources"].append(entry["source"])
+            continue
+        current = {
+            "start": entry["start"],
+            "end": entry["end"],
+            "label": entry["label"],
+            "confidence": entry["confidence"],
+            "is_nsfw": entry["is_nsfw"],
+            "sources": [entry["source"]],
+        }
+        open_by_label[entry["label"]] = current
+        merged.append(current)
+    return merged
+
+
+def _vtt_time(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600000)
+    minutes, millis = divmod(millis, 60000)
+    secs, millis = divmod(millis, 1000)
+    return f"{hours:02d}:{minutes:02d}:{secs:02d}.{millis:03d}"
+
+
+def to_webvtt(intervals: List[dict]) -> str:
+    """Render intervals as a WebVTT metadata track with JSON cue payloads"""
+    lines = ["WEBVTT", ""]
+    for i, interval in enumerate(intervals, start=1):
+        payload = {k: interval[k] for k in ("label", "confidence", "is_nsfw", "sources")}
+        lines.append(str(i))
+        lines.append(f"{_vtt_time(interval['start'])} --> {_vtt_time(interval['end'])}")
+        lines.append(json.dumps(payload))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def timeline_etag(content_hash: str, version: int, fmt: str) -> str:
+    """Strong ETag for one representation of a timeline at a given version"""
+    digest = hashlib.sha256(f"{content_hash}:{version}:{fmt}".encode()).hexdigest()[:32]
+    return f'"{digest}"'
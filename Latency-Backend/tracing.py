@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Where finished session traces are written
+TRACE_DIR = os.environ.get("TRACE_DIR", "traces")
+# Fraction of sessions traced without being asked to (0 disables sampling)
+TRACE_SAMPLE_RATE = float(os.environ.get("TRACE_SAMPLE_RATE", "0"))
+
+
+class _NullSpan:
+    """Shared no-op span returned when a session is not being traced"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = _NullSpan()
+
+
+class SessionTracer:
+    """Collects Chrome trace-event spans for one session.
+
+    Spans are grouped into named tracks ("playhead", "background", ...)
+    rather than OS threads: each track is sequential, so spans opened from
+    coroutines and from executor threads working on its behalf nest
+    correctly when viewed in Perfetto or chrome://tracing.
+    """
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.pid = os.getpid()
+        self.events: List[dict] = []
+        self.tracks: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def _tid(self, track: str) -> int:
+        tid = self.tracks.get(track)
+        if tid is None:
+            with self._lock:
+                tid = self.tracks.setdefault(track, len(self.tracks) + 1)
+        return tid
+
+    @contextmanager
+    def span(self, track: str, name: str, **args):
+        start = time.perf_counter_ns()
+        try:
+            yield
+        finally:
+            end = time.perf_counter_ns()
+            event = {
+                "name": name,
+                "ph": "X",
+                "ts": start / 1000,
+                "dur": (end - start) / 1000,
+                "pid": self.pid,
+                "tid": self._tid(track),
+            }
+            if args:
+                event["args"] = args
+            with self._lock:
+                self.events.append(event)
+
+    def to_json(self) -> dict:
+        metadata = [{
+            "name": "process_name", "ph": "M", "pid": self.pid, "tid": 0,
+            "args": {"name": f"session {self.session_id}"}
+        }]
+        metadata += [{
+            "name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid,
+            "args": {"name": track}
+        } for track, tid in self.tracks.items()]
+        with self._lock:
+            events = list(self.events)
+        return {"traceEvents": metadata + events, "displayTimeUnit": "ms"}
+
+
+class Tracing:
+    """Per-session tracers, enabled on request or by random sampling"""
+
+    def __init__(self, trace_dir: str = TRACE_DIR, sample_rate: float = TRACE_SAMPLE_RATE):
+        self.trace_dir = trace_dir
+        self.sample_rate = sample_rate
+        self.tracers: Dict[str, SessionTracer] = {}
+
+    def start(self, session_id: str, requested: bool = False) -> bool:
+        """Begin tracing a session if requested or sampled; returns whether it is traced"""
+        if session_id in self.tracers:
+            return True
+        if requested or (self.sample_rate > 0 and random.random() < self.sample_rate):
+            self.tracers[session_id] = SessionTracer(session_id)
+            logger.info(f"Tracing enabled for session {session_id}")
+            return True
+        return False
+
+    def span(self, session_id: str, track: str, name: str, **args):
+        tracer = self.tracers.get(session_id)
+        if tracer is None:
+            return NULL_SPAN
+        return tracer.span(track, name, **args)
+
+    def finish(self, session_id: str, part: str = "") -> Optional[str]:
+        """Write a session's trace to TRACE_DIR and stop tracing it.
+
+        ``part`` names a separately written piece of the session (e.g.
+        "upload"), which goes to trace_<session_id>_<part>.json.
+        """
+        tracer = self.tracers.pop(session_id, None)
+        if tracer is None:
+            return None
+        os.makedirs(self.trace_dir, exist_ok=True)
+        suffix = f"_{part}" if part else ""
+        path = os.path.join(self.trace_dir, f"trace_{session_id}{suffix}.json")
+        try:
+            with open(path, "w") as f:
+                json.dump(tracer.to_json(), f)
+            logger.info(f"Wrote trace for session {session_id}: {path} ({len(tracer.events)} spans)")
+            return path
+        except Exception as e:
+            logger.error(f"Error writing trace for {session_id}: {e}")
+            return None
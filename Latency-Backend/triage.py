@@ -0,0 +1,217 @@
+import cv2
+import functools
+import logging
+import queue
+import re
+import shutil
+import subprocess
+import threading
+import time
+from typing import Callable, Iterator, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Keyframes are decoded straight to model resolution
+TRIAGE_SIZE = 224
+# A keyframe is flagged when it is NSFW with at least this confidence ...
+NSFW_THRESHOLD = 0.7
+# ... and is treated as uncertain when the top score is below this
+UNCERTAIN_THRESHOLD = 0.8
+# Sampling step inside the GOPs around flagged/uncertain keyframes
+DENSE_INTERVAL = 0.5
+# Grid step used when ffmpeg is unavailable and keyframes can't be located
+FALLBACK_INTERVAL = 2.0
+
+
+class KeyframeDecodeError(RuntimeError):
+    """ffmpeg's keyframe output could not be matched to decoder timestamps"""
+
+
+# showinfo logs one line per frame reaching the filter graph
+_SHOWINFO_FRAME = re.compile(r"\bn:\s*\d+\s.*\bpts_time:\s*(\S+)")
+_END = object()
+
+
+@functools.lru_cache(maxsize=1)
+def fps_passthrough_args() -> List[str]:
+    """ffmpeg options that emit every decoded frame unchanged.
+
+    ``-fps_mode`` replaced ``-vsync`` in ffmpeg 5.1 and older builds reject
+    it; newer builds still accept ``-vsync``.
+    """
+    try:
+        result = subprocess.run(['ffmpeg', '-hide_banner', '-h', 'full'], capture_output=True, text=True, timeout=30)
+        if '-fps_mode' in result.stdout:
+            return ['-fps_mode', 'passthrough']
+    except (OSError, subprocess.TimeoutExpired):
+        pass
+    return ['-vsync', 'passthrough']
+
+
+def decode_keyframes(input_path: str, size: int = TRIAGE_SIZE) -> Iterator[Tuple[float, np.ndarray]]:
+    """Yield (pts_time, RGB keyframe) at model resolution; P/B frames are never decoded.
+
+    Timestamps come from the decoder itself (via showinfo), so each frame is
+    paired with its own presentation time.
+    """
+    cmd = [
+        'ffmpeg', '-hide_banner', '-nostats', '-loglevel', 'info',
+        '-skip_frame', 'nokey',  # decoder drops everything but I-frames
+        '-i', input_path,
+        '-map', '0:v:0',
+        *fps_passthrough_args(),
+        '-vf', f'showinfo,scale={size}:{size}',
+        '-f', 'rawvideo', '-pix_fmt', 'rgb24',
+        'pipe:1'
+    ]
+    frame_bytes = size * size * 3
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    times: queue.Queue = queue.Queue()
+
+    def read_times():
+        for line in proc.stderr:
+            match = _SHOWINFO_FRAME.search(line.decode(errors='replace'))
+            if match:
+                try:
+                    times.put(float(match.group(1)))
+                except ValueError:
+                    times.put(None)
+        times.put(_END)
+
+    threading.Thread(target=read_times, daemon=True).start()
+    try:
+        while True:
+            buf = proc.stdout.read(frame_bytes)
+            if len(buf) < frame_bytes:
+                break
+            try:
+                t = times.get(timeout=30)
+            except queue.Empty:
+                raise KeyframeDecodeError("No showinfo timestamp for decoded keyframe")
+            if t is _END:
+                raise KeyframeDecodeError("More keyframes decoded than timestamps logged")
+            if t is None:
+                continue
+            yield t, np.frombuffer(buf, dtype=np.uint8).reshape(size, size, 3)
+    finally:
+        proc.stdout.close()
+        proc.kill()
+        proc.wait()
+
+
+def _is_positive(result: dict, threshold: float) -> bool:
+    return result["label"].lower() != "normal" and result["score"] >= threshold
+
+
+def _merge_windows(windows: List[Tuple[float, float]]) -> List[Tuple[float, float]]:
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _sample_window(cap, fps: float, start: float, end: float, interval: float, classify_fn) -> List[dict]:
+    """Classify frames every ``interval`` seconds in [start, end), reading sequentially"""
+    samples = []
+    step = max(1, int(round(interval * fps)))
+    first = int(start * fps)
+    last = int(end * fps)
+    # Windows start on keyframes, so this seek is cheap
+    cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+    for frame_idx in range(first, last):
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if (frame_idx - first) % step == 0:
+            result = classify_fn(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            samples.append({"timestamp": frame_idx / fps, "source": "dense", **result})
+    return samples
+
+
+def triage_video(
+    input_path: str,
+    classify_fn: Callable[[np.ndarray], dict],
+    nsfw_threshold: float = NSFW_THRESHOLD,
+    uncertain_threshold: float = UNCERTAIN_THRESHOLD,
+    dense_interval: float = DENSE_INTERVAL
+) -> dict:
+    """Fast whole-video screening from keyframes, densified only where needed.
+
+    ``classify_fn`` takes an RGB frame and returns the top prediction as a
+    {"label", "score"} dict. Returns a verdict, the flagged intervals and
+    every sample taken.
+    """
+    start_time = time.monotonic()
+    logger.info(f"Starting triage: {input_path}")
+
+    cap = cv2.VideoCapture(input_path)
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video file: {input_path}")
+    fps = cap.get(cv2.CAP_PROP_FPS)
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    duration = total_frames / fps if fps > 0 else 0
+
+    try:
+        # Stage 1: coarse timeline from keyframes only
+        keyframes: List[Tuple[float, dict]] = []
+        if shutil.which('ffmpeg'):
+            try:
+                for t, frame in decode_keyframes(input_path):
+                    keyframes.append((t, classify_fn(frame)))
+            except KeyframeDecodeError as e:
+                # Timestamps can no longer be trusted, so discard stage 1
+                logger.warning(f"Keyframe decode unreliable: {e}")
+                keyframes = []
+            keyframes.sort(key=lambda k: k[0])
+
+        if not keyframes:
+            logger.warning(f"Keyframe decode unavailable, falling back to a {FALLBACK_INTERVAL}s grid")
+            t = 0.0
+            while t < duration:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, int(t * fps))
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                keyframes.append((t, classify_fn(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))))
+                t += FALLBACK_INTERVAL
+
+        samples = [{"timestamp": t, "source": "keyframe", **r} for t, r in keyframes]
+        logger.info(f"Triage stage 1: {len(keyframes)} keyframes classified")
+
+        # Stage 2: densify within the GOPs around flagged or uncertain keyframes
+        windows = []
+        bounds = [t for t, _ in keyframes] + [duration]
+        for i, (t, result) in enumerate(keyframes):
+            if _is_positive(result, nsfw_threshold) or result["score"] < uncertain_threshold:
+                windows.append((bounds[i - 1] if i > 0 else 0.0, bounds[i + 1]))
+        windows = _merge_windows(windows)
+
+        for window_start, window_end in windows:
+            samples.extend(_sample_window(cap, fps, window_start, window_end, dense_interval, classify_fn))
+        samples.sort(key=lambda s: s["timestamp"])
+    finally:
+        cap.release()
+
+    flagged = _merge_windows([
+        (s["timestamp"], s["timestamp"] + dense_interval)
+        for s in samples if _is_positive(s, nsfw_threshold)
+    ])
+    elapsed = time.monotonic() - start_time
+    verdict = "nsfw" if flagged else "clean"
+    logger.info(f"Triage verdict for {input_path}: {verdict} ({len(samples)} samples, {elapsed:.2f}s)")
+
+    return {
+        "verdict": verdict,
+        "duration": duration,
+        "keyframes": len(keyframes),
+        "dense_windows": [list(w) for w in windows],
+        "samples": len(samples),
+        "flagged_intervals": [list(f) for f in flagged],
+        "timeline": samples,
+        "elapsed_seconds": round(elapsed, 3),
+    }
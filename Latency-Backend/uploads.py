@@ -0,0 +1,390 @@
+import asyncio
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class UploadGone(Exception):
+    """The upload was aborted, expired or committed while a part was being written"""
+
+
+class TooManyUploads(Exception):
+    """The server already holds the maximum number of open uploads"""
+
+
+class UploadBusy(Exception):
+    """Parts are still being written while a commit was asked for, or the reverse"""
+
+
+class ChunkedUpload:
+    """State of one resumable upload, as stored in its sidecar file"""
+
+    def __init__(self, upload_id: str, path: str, size: int, content_type: str, sha256: str, filename: str,
+                 created_at: float = None, last_activity: float = None,
+                 ranges: List[Tuple[int, int]] = None, committed: bool = False, aborted: bool = False,
+                 parts: Dict[str, float] = None, committing: float = 0.0, traced: bool = False):
+        self.upload_id = upload_id
+        self.path = path
+        self.size = size
+        self.content_type = content_type
+        self.sha256 = sha256.lower()
+        self.filename = filename
+        self.created_at = created_at or time.time()
+        self.last_activity = last_activity or self.created_at
+        # Sorted, non-overlapping [start, end) byte ranges written so far
+        self.ranges: List[Tuple[int, int]] = [tuple(r) for r in ranges or []]
+        self.committed = committed
+        self.aborted = aborted
+        # Parts being written, by token, with the time each last wrote
+        self.parts: Dict[str, float] = dict(parts or {})
+        # When a commit started verifying the file; 0 when none is running
+        self.committing = committing
+        # Whether the server chose to trace this upload, whichever worker serves it
+        self.traced = traced
+
+    def to_dict(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "path": self.path,
+            "size": self.size,
+            "content_type": self.content_type,
+            "sha256": self.sha256,
+            "filename": self.filename,
+            "created_at": self.created_at,
+            "last_activity": self.last_activity,
+            "ranges": [list(r) for r in self.ranges],
+            "committed": self.committed,
+            "aborted": self.aborted,
+            "parts": self.parts,
+            "committing": self.committing,
+            "traced": self.traced,
+        }
+
+    def add_range(self, start: int, end: int):
+        merged = []
+        for r_start, r_end in sorted(self.ranges + [(start, end)]):
+            if merged and r_start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], r_end))
+            else:
+                merged.append((r_start, r_end))
+        self.ranges = merged
+
+    @property
+    def received_bytes(self) -> int:
+        return sum(end - start for start, end in self.ranges)
+
+    @property
+    def contiguous_bytes(self) -> int:
+        """Length of the fully written prefix of the file"""
+        if self.ranges and self.ranges[0][0] == 0:
+            return self.ranges[0][1]
+        return 0
+
+    def missing_ranges(self) -> List[Tuple[int, int]]:
+        missing, cursor = [], 0
+        for start, end in self.ranges:
+            if start > cursor:
+                missing.append((cursor, start))
+            cursor = end
+        if cursor < self.size:
+            missing.append((cursor, self.size))
+        return missing
+
+    def status(self) -> dict:
+        return {
+            "upload_id": self.upload_id,
+            "size": self.size,
+            "received_bytes": self.received_bytes,
+            "contiguous_bytes": self.contiguous_bytes,
+            "missing_ranges": [list(r) for r in self.missing_ranges()],
+            "committed": self.committed,
+        }
+
+
+class UploadManager:
+    """Resumable uploads: create, PUT parts by offset (in any order), commit.
+
+    Parts are written with pwrite straight into their final position, so
+    parallel parts never need reassembly. Until commit, the leading
+    contiguous bytes can already be read, which is enough to start
+    classifying faststart MP4s.
+
+    Upload state lives in a sidecar JSON file next to the video, updated
+    under ``flock``, so parts, progress and commit can be served by any
+    worker process. Each part writes through its own file descriptor. The
+    video file is sparse until written, and uploads idle for longer than
+    ``ttl`` seconds are aborted by ``sweep``.
+
+    Every pwrite happens under the sidecar lock after checking the upload
+    is still open, so once commit has verified the checksum the file can no
+    longer change. Parts in flight are listed in the sidecar and commit
+    refuses to start while any is still writing (one silent for
+    ``part_timeout`` seconds is taken to be dead).
+    """
+
+    def __init__(self, state_dir: str, io_chunk: int = 1024 * 1024, ttl: float = 900.0, max_open: int = 16,
+                 part_timeout: float = 60.0):
+        self.state_dir = state_dir
+        self.io_chunk = io_chunk
+        self.ttl = ttl
+        self.max_open = max(1, max_open)
+        self.part_timeout = part_timeout
+        # Committed is final, so this process stops re-reading those sidecars
+        self._committed: set = set()
+        # Wakes waiters in this process early; other workers are seen by polling
+        self._progress: Dict[str, asyncio.Event] = {}
+
+    def _state_path(self, upload_id: str) -> str:
+        return os.path.join(self.state_dir, f"upload_{upload_id}.json")
+
+    @contextmanager
+    def _locked(self, upload_id: str, exclusive: bool):
+        """Open and lock an upload's sidecar, yielding (file, state) or (None, None)"""
+        try:
+            f = open(self._state_path(upload_id), "r+" if exclusive else "r")
+        except FileNotFoundError:
+            yield None, None
+            return
+        with f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                data = json.loads(f.read() or "null")
+            except json.JSONDecodeError:
+                data = None
+            upload = ChunkedUpload(**data) if data else None
+            if upload is not None and upload.aborted:
+                upload = None
+            yield f, upload
+
+    @staticmethod
+    def _save(f, upload: ChunkedUpload):
+        f.seek(0)
+        f.truncate()
+        f.write(json.dumps(upload.to_dict()))
+        f.flush()
+
+    def _open_uploads(self) -> List[ChunkedUpload]:
+        result = []
+        for name in os.listdir(self.state_dir):
+            if name.startswith("upload_") and name.endswith(".json"):
+                upload = self.get(name[len("upload_"):-len(".json")])
+                if upload is not None:
+                    result.append(upload)
+        return result
+
+    def create(self, upload_id: str, path: str, size: int, content_type: str, sha256: str, filename: str,
+               traced: bool = False) -> ChunkedUpload:
+        if sum(1 for u in self._open_uploads() if not u.committed) >= self.max_open:
+            raise TooManyUploads(f"At most {self.max_open} uploads may be open at once")
+        upload = ChunkedUpload(upload_id, path, size, content_type, sha256, filename, traced=traced)
+        # Sized but sparse: disk is only used as parts arrive
+        with open(path, "wb") as f:
+            f.truncate(size)
+        fd = os.open(self._state_path(upload_id), os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+        with os.fdopen(fd, "w") as f:
+            f.write(json.dumps(upload.to_dict()))
+        logger.info(f"Created chunked upload {upload_id}: {size} bytes -> {path}")
+        return upload
+
+    def get(self, upload_id: str) -> Optional[ChunkedUpload]:
+        with self._locked(upload_id, exclusive=False) as (_, upload):
+            return upload
+
+    def in_progress(self, upload_id: str) -> Optional[ChunkedUpload]:
+        if upload_id in self._committed:
+            return None
+        upload = self.get(upload_id)
+        if upload is not None and upload.committed:
+            self._committed.add(upload_id)
+            return None
+        return upload
+
+    def _live_parts(self, upload: ChunkedUpload) -> List[str]:
+        cutoff = time.time() - self.part_timeout
+        return [token for token, last in upload.parts.items() if last >= cutoff]
+
+    def _writable(self, upload_id: str, upload: Optional[ChunkedUpload]):
+        if upload is None or upload.committed:
+            raise UploadGone(f"Upload {upload_id} is no longer open")
+        if upload.committing >= time.time() - self.part_timeout:
+            raise UploadBusy(f"Upload {upload_id} is being committed")
+
+    def _begin_part(self, upload_id: str, token: str):
+        with self._locked(upload_id, exclusive=True) as (f, upload):
+            self._writable(upload_id, upload)
+            upload.parts[token] = time.time()
+            self._save(f, upload)
+
+    def _write(self, upload_id: str, token: str, fd: int, data: bytes, position: int) -> ChunkedUpload:
+        with self._locked(upload_id, exclusive=True) as (f, upload):
+            # Checked under the lock commit takes, so a verified file never changes
+            self._writable(upload_id, upload)
+            os.pwrite(fd, data, position)
+            upload.add_range(position, position + len(data))
+            upload.last_activity = upload.parts[token] = time.time()
+            self._save(f, upload)
+            return upload
+
+    def _end_part(self, upload_id: str, token: str):
+        with self._locked(upload_id, exclusive=True) as (f, upload):
+            if upload is not None and upload.parts.pop(token, None) is not None:
+                self._save(f, upload)
+
+    def _notify(self, upload_id: str):
+        event = self._progress.pop(upload_id, None)
+        if event is not None:
+            event.set()
+
+    async def write_part(self, upload: ChunkedUpload, offset: int, stream) -> Tuple[int, ChunkedUpload]:
+        """Write a request body stream at ``offset``; returns (bytes written, new state)"""
+        upload_id = upload.upload_id
+        token = uuid.uuid4().hex
+        await asyncio.to_thread(self._begin_part, upload_id, token)
+        try:
+            fd = await asyncio.to_thread(os.open, upload.path, os.O_WRONLY)
+        except FileNotFoundError:
+            await asyncio.to_thread(self._end_part, upload_id, token)
+            raise UploadGone(f"Upload {upload_id} is no longer open")
+        position = offset
+        buffer = bytearray()
+
+        async def flush():
+            nonlocal position, upload
+            upload = await asyncio.to_thread(self._write, upload_id, token, fd, bytes(buffer), position)
+            position += len(buffer)
+            buffer.clear()
+            self._notify(upload_id)
+
+        try:
+            async for chunk in stream:
+                if position + len(buffer) + len(chunk) > upload.size:
+                    raise ValueError("Part extends past the declared upload size")
+                buffer.extend(chunk)
+                if len(buffer) >= self.io_chunk:
+                    await flush()
+            if buffer:
+                await flush()
+        finally:
+            os.close(fd)
+            await asyncio.to_thread(self._end_part, upload_id, token)
+        return position - offset, upload
+
+    async def wait_for_bytes(self, upload_id: str, nbytes: int, timeout: float = None) -> bool:
+        """Wait until the first ``nbytes`` are contiguous (or the upload is gone/done)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            upload = await asyncio.to_thread(self.in_progress, upload_id)
+            if upload is None or upload.contiguous_bytes >= min(nbytes, upload.size):
+                return True
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return False
+            event = self._progress.setdefault(upload_id, asyncio.Event())
+            try:
+                # Parts may be arriving at another worker, so poll as well
+                await asyncio.wait_for(event.wait(), 0.25 if remaining is None else min(remaining, 0.25))
+            except asyncio.TimeoutError:
+                pass
+
+    def available_fraction(self, upload_id: str) -> float:
+        """Fraction of the file readable so far; 1.0 for anything not mid-upload"""
+        upload = self.in_progress(upload_id)
+        if upload is None:
+            return 1.0
+        return upload.contiguous_bytes / upload.size if upload.size else 1.0
+
+    def _hash_file(self, path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(self.io_chunk), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _begin_commit(self, upload_id: str) -> ChunkedUpload:
+        """Stop new parts from writing, unless some are still in flight"""
+        with self._locked(upload_id, exclusive=True) as (f, upload):
+            self._writable(upload_id, upload)
+            if self._live_parts(upload):
+                raise UploadBusy(f"Upload {upload_id} still has parts being written")
+            missing = upload.missing_ranges()
+            if missing:
+                raise ValueError(f"Upload incomplete, missing byte ranges: {missing[:5]}")
+            upload.committing = time.time()
+            self._save(f, upload)
+            return upload
+
+    def _end_commit(self, upload_id: str, verified: bool) -> ChunkedUpload:
+        with self._locked(upload_id, exclusive=True) as (f, upload):
+            if upload is None:
+                raise UploadGone(f"Upload {upload_id} is no longer open")
+            upload.committing = 0.0
+            upload.committed = verified
+            upload.last_activity = time.time()
+            self._save(f, upload)
+            return upload
+
+    async def commit(self, upload_id: str) -> ChunkedUpload:
+        """Verify completeness and checksum; raises ValueError on mismatch"""
+        upload = await asyncio.to_thread(self._begin_commit, upload_id)
+        try:
+            actual = await asyncio.to_thread(self._hash_file, upload.path)
+        except BaseException:
+            await asyncio.to_thread(self._end_commit, upload_id, False)
+            raise
+        upload = await asyncio.to_thread(self._end_commit, upload_id, actual == upload.sha256)
+        if not upload.committed:
+            raise ValueError(f"Checksum mismatch: expected {upload.sha256}, got {actual}")
+        self._committed.add(upload_id)
+        self._notify(upload_id)
+        logger.info(f"Committed chunked upload {upload_id} ({upload.size} bytes)")
+        return upload
+
+    def _abort(self, upload_id: str) -> bool:
+        with self._locked(upload_id, exclusive=True) as (f, upload):
+            if upload is None:
+                return False
+            # Marked before unlinking, so anyone already waiting on the lock
+            # sees the upload as gone. Parts still in flight hold their own
+            # descriptors and only ever write into the unlinked file.
+            upload.aborted = True
+            self._save(f, upload)
+            os.remove(self._state_path(upload_id))
+            if os.path.exists(upload.path):
+                os.remove(upload.path)
+            return True
+
+    async def abort(self, upload_id: str):
+        if await asyncio.to_thread(self._abort, upload_id):
+            self._notify(upload_id)
+            logger.info(f"Aborted chunked upload {upload_id}")
+
+    def forget(self, upload_id: str):
+        """Drop the sidecar of a committed upload once its session is gone"""
+        upload = self.get(upload_id)
+        if upload is not None and upload.committed:
+            try:
+                os.remove(self._state_path(upload_id))
+            except FileNotFoundError:
+                pass
+        self._committed.discard(upload_id)
+        self._progress.pop(upload_id, None)
+
+    async def sweep(self):
+        """Abort uploads idle for longer than ``ttl`` and forget old committed ones"""
+        cutoff = time.time() - self.ttl
+        for upload in await asyncio.to_thread(self._open_uploads):
+            if upload.last_activity >= cutoff:
+                continue
+            if upload.committed:
+                self.forget(upload.upload_id)
+            else:
+                logger.warning(f"Expiring idle upload {upload.upload_id}")
+                await self.abort(upload.upload_id)
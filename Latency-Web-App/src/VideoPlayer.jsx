@@ -267,6 +267,19 @@ const VideoPlayer = () => {
           setIsConnected(false);
           break;
 
+        case "busy":
+          // Server shed this playhead request; the next one will be tried
+          console.warn(`Server busy, skipped frame at ${data.timestamp.toFixed(1)}s`);
+          break;
+
+        case "degraded":
+          console.warn(
+            data.active
+              ? `Server under load, background sampling every ${data.sampling_interval.toFixed(1)}s`
+              : "Server load normal, background sampling restored"
+          );
+          break;
+
         default:
           console.log("Unknown message type:", data.type);
       }